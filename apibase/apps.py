@@ -0,0 +1,16 @@
+from django.apps import AppConfig, apps
+
+
+class ApibaseConfig(AppConfig):
+    name = "apibase"
+
+    def ready(self):
+        from . import filters, paginations, permissions
+        from .settings import apibase_settings
+
+        # cache invalidation is connected once, never from the request path
+        paginations.connect_count_invalidation(apps.get_model(i) for i in apibase_settings.COUNT_CACHE_MODELS)
+        filters.connect_choices_invalidation(apps.get_model(i) for i in apibase_settings.FILTER_CHOICES_MODELS)
+        if apps.is_installed("django.contrib.auth"):
+            permissions.connect_perms_invalidation()
+            permissions.connect_permission_objects_invalidation()
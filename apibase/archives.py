@@ -1,47 +1,200 @@
+import io
+import shutil
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from tempfile import SpooledTemporaryFile, TemporaryFile
 
 from django.core import serializers
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
+from django.db import connections
+from django.http import StreamingHttpResponse
 
+from . import utils
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamBuffer(io.RawIOBase):
+    """write-only, unseekable stream collecting what ZipFile writes until `drain()`"""
 
-class Zipball:
     def __init__(self):
-        self.in_memory_zip = BytesIO()
+        self.chunks = []
 
-    def append(self, filename_in_zip, file_contents):
-        # Get a handle to the in-memory zip in append mode
-        zf = zipfile.ZipFile(self.in_memory_zip, "a", zipfile.ZIP_DEFLATED, False)
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def iter_chunks(contents):
+    """bytes chunks of bytes/str, a file-like object or an iterable of bytes/str"""
+    if isinstance(contents, (bytes, str)):
+        contents = [contents]
+    elif hasattr(contents, "read"):
+        file = contents
+        contents = iter(lambda: file.read(CHUNK_SIZE), file.read(0))
+    for chunk in contents:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
 
-        # Write the file to the in-memory zip
-        zf.writestr(filename_in_zip, file_contents)
 
+class Zipball:
+    """
+    ZIP archive written with one open ZipFile
+
+    - default: in memory (BytesIO)
+    - `spool_size`: SpooledTemporaryFile, moved to disk above `spool_size` bytes
+    - `stream`: written straight to a (non seekable) stream, see `Zipball.iterate`
+    """
+
+    def __init__(self, stream=None, spool_size=None):
+        if stream is None:
+            stream = BytesIO() if spool_size is None else SpooledTemporaryFile(max_size=spool_size)
+        self.in_memory_zip = stream
+        self.zipfile = None
+
+    def open(self):
+        if self.zipfile is None:
+            # appending after `close()` (e.g. `read()`) reopens the archive
+            seekable = getattr(self.in_memory_zip, "seekable", lambda: True)()
+            mode = "a" if seekable and self.in_memory_zip.seek(0, io.SEEK_END) else "w"
+            self.zipfile = zipfile.ZipFile(self.in_memory_zip, mode, zipfile.ZIP_DEFLATED, True)
+        return self.zipfile
+
+    def close(self):
+        """write the central directory"""
+        if self.zipfile is not None:
+            self.zipfile.close()
+            self.zipfile = None
+        return self
+
+    def open_entry(self, filename_in_zip, force_zip64=True):
+        """writable binary file of a new entry"""
+        zinfo = zipfile.ZipInfo(filename_in_zip, time.localtime(time.time())[:6])
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
         # Mark the files as having been created on Windows so that
         # Unix permissions are not inferred as 0000
-        for zfile in zf.filelist:
-            zfile.create_system = 0
+        zinfo.create_system = 0
+        return self.open().open(zinfo, "w", force_zip64=force_zip64)
+
+    def write_entry(self, filename_in_zip, contents):
+        """write `contents` in chunks, yielding after each one"""
+        # sizes of streamed contents are unknown until written
+        with self.open_entry(filename_in_zip, force_zip64=not isinstance(contents, (bytes, str))) as dest:
+            for chunk in iter_chunks(contents):
+                dest.write(chunk)
+                yield
 
+    def append(self, filename_in_zip, file_contents):
+        for _ in self.write_entry(filename_in_zip, file_contents):
+            pass
         return self
 
+    def append_stream(self, filename_in_zip, contents):
+        """append from a file-like object or an iterable of bytes/str without reading it all"""
+        return self.append(filename_in_zip, contents)
+
     def read(self):
         """Returns a string with the contents of the in-memory zip."""
+        self.close()
         self.in_memory_zip.seek(0)
         return self.in_memory_zip.read()
 
     def write_to(self, stream):
-        stream.write(self.read())
+        self.close()
+        self.in_memory_zip.seek(0)
+        shutil.copyfileobj(self.in_memory_zip, stream, CHUNK_SIZE)
 
     def write_to_file(self, filename):
         """Writes the in-memory zip to a file."""
-        f = open(filename, "wb")
-        f.write(self.read())
-        f.close()
+        with open(filename, "wb") as f:
+            self.write_to(f)
 
     def to_contentfile(self):
-        return ContentFile(self.read())
+        if isinstance(self.in_memory_zip, BytesIO):
+            return ContentFile(self.read())
+        # spooled: saved to a storage in chunks
+        self.close()
+        self.in_memory_zip.seek(0)
+        return File(self.in_memory_zip)
+
+    @classmethod
+    def iterate(cls, entries):
+        """yield the bytes of an archive of `entries` ((filename_in_zip, contents), ...) while it is written"""
+        buffer = StreamBuffer()
+        zipball = cls(stream=buffer)
+        for filename_in_zip, contents in entries:
+            for _ in zipball.write_entry(filename_in_zip, contents):
+                data = buffer.drain()
+                if data:
+                    yield data
+        zipball.close()
+        yield buffer.drain()
+
+    @classmethod
+    def streaming_response(cls, entries, filename=None):
+        """StreamingHttpResponse of an archive of `entries`, memory bounded by the chunk size"""
+        from .renderers import ZipballRenderer
+
+        response = StreamingHttpResponse(cls.iterate(entries), content_type=ZipballRenderer.media_type)
+        if filename:
+            response["Content-Disposition"] = utils.to_content_disposition(filename)
+        return response
+
+
+def dump_query(queryset, stream, chunk_size=2000):
+    """serialize `queryset` as JSON into binary `stream`, `chunk_size` rows in memory at a time"""
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        serializers.serialize("json", queryset.iterator(chunk_size=chunk_size), stream=text)
+    finally:
+        # `stream` stays open
+        text.detach()
 
 
 class ModelZipball(Zipball):
-    def append_query(self, queryset):
-        file_name = f"{queryset.model._meta.app_label}.{queryset.model._meta.model_name}.json"
-        return self.append(file_name, serializers.serialize("json", queryset))
+    chunk_size = 2000
+
+    def get_file_name(self, queryset):
+        return f"{queryset.model._meta.app_label}.{queryset.model._meta.model_name}.json"
+
+    def append_query(self, queryset, chunk_size=None):
+        with self.open_entry(self.get_file_name(queryset)) as dest:
+            dump_query(queryset, dest, chunk_size=chunk_size or self.chunk_size)
+        return self
+
+    def dump_to_file(self, queryset, chunk_size=None):
+        """JSON of `queryset` in a temporary file (worker of `append_queries`)"""
+        file = TemporaryFile()
+        try:
+            dump_query(queryset, file, chunk_size=chunk_size or self.chunk_size)
+        finally:
+            # one connection per thread
+            connections[queryset.db].close()
+        file.seek(0)
+        return file
+
+    def append_queries(self, querysets, workers=None, chunk_size=None):
+        """
+        append `querysets` as separate entries, dumped by `workers` threads in parallel
+        (dumped to temporary files, then copied into the archive in order)
+        """
+        querysets = list(querysets)
+        if not workers or workers <= 1:
+            for queryset in querysets:
+                self.append_query(queryset, chunk_size=chunk_size)
+            return self
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            dumps = executor.map(lambda queryset: self.dump_to_file(queryset, chunk_size), querysets)
+            for queryset, file in zip(querysets, dumps):
+                with file, self.open_entry(self.get_file_name(queryset)) as dest:
+                    shutil.copyfileobj(file, dest, CHUNK_SIZE)
+        return self
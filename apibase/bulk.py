@@ -0,0 +1,46 @@
+from django.db import connections, router
+from django.db.models import Model, signals
+
+
+def overrides_save(model):
+    """`bulk_create`/`bulk_update` skip `save()`: models customizing it must be saved row by row"""
+    return model.save is not Model.save
+
+
+def has_save_receivers(model):
+    """`bulk_create`/`bulk_update` send no `pre_save`/`post_save`: models with receivers must be saved row by row"""
+    return signals.pre_save.has_listeners(model) or signals.post_save.has_listeners(model)
+
+
+def can_bulk_update(model):
+    return not (overrides_save(model) or has_save_receivers(model))
+
+
+def can_return_pks(model):
+    connection = connections[router.db_for_write(model)]
+    return connection.features.can_return_rows_from_bulk_insert
+
+
+def can_bulk_create(model, needs_pk=False):
+    if not can_bulk_update(model) or model._meta.parents:
+        return False
+    return can_return_pks(model) if needs_pk else True
+
+
+def bulk_set_many_to_many(model, name, pairs, batch_size=None):
+    """pairs: [(instance, [related, ...])] for instances created by `bulk_create`"""
+    field = model._meta.get_field(name)
+    through = field.remote_field.through
+    if not through._meta.auto_created:
+        for instance, values in pairs:
+            getattr(instance, name).set(values)
+        return
+
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    rows = [
+        through(**{f"{source}_id": instance.pk, f"{target}_id": getattr(value, "pk", value)})
+        for instance, values in pairs
+        for value in values or []
+    ]
+    through._default_manager.bulk_create(rows, batch_size=batch_size)
@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django.contrib import auth
 
 
@@ -9,4 +11,41 @@ def all_permissions(self):
     return permissions
 
 
+def load_permissions(users):
+    """
+    fill ModelBackend's permission caches (`_user_perm_cache`, `_group_perm_cache`, `_perm_cache`)
+    of `users` with one query for the direct and one for the group permissions of all of them
+    """
+    from django.contrib.auth.models import Permission
+
+    users = [i for i in users if i.is_active and not i.is_anonymous and not hasattr(i, "_perm_cache")]
+    if not users:
+        return
+
+    def codes(queryset, *key):
+        res = defaultdict(set)
+        for *pk, app_label, codename in queryset.values_list(*key, "content_type__app_label", "codename").order_by():
+            res[pk[0] if pk else None].add(f"{app_label}.{codename}")
+        return res
+
+    model = type(users[0])
+    pks = {i.pk for i in users if not i.is_superuser}
+    user_perms = group_perms = {}
+    if pks:
+        direct = model.user_permissions.field.related_query_name()
+        group = f"group__{model.groups.field.related_query_name()}"
+        user_perms = codes(Permission.objects.filter(**{f"{direct}__in": pks}), direct)
+        group_perms = codes(Permission.objects.filter(**{f"{group}__in": pks}), group)
+    # superusers: every permission
+    everything = codes(Permission.objects.all())[None] if len(pks) < len(users) else set()
+
+    for user in users:
+        if user.is_superuser:
+            user._user_perm_cache = user._group_perm_cache = set(everything)
+        else:
+            user._user_perm_cache = user_perms.get(user.pk, set())
+            user._group_perm_cache = group_perms.get(user.pk, set())
+        user._perm_cache = {*user._user_perm_cache, *user._group_perm_cache}
+
+
 User = type("User", (), {"all_permissions": all_permissions})
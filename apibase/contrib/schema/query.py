@@ -1,14 +1,25 @@
 import graphene
 import graphene.relay
 from graphene_django.types import DjangoObjectType
+from promise import Promise
+from promise.dataloader import DataLoader
 
+from apibase.graphql.loaders import get_context_loaders
 from apibase.schema import NodeMixin, NodeSet
 
 from .. import models
-from ..models.methods import all_permissions
+from ..models.methods import all_permissions, load_permissions
 from . import filters
 
 
+class PermissionsLoader(DataLoader):
+    """`all_permissions` of the users resolved in one tick, with their permission caches loaded together"""
+
+    def batch_load_fn(self, users):
+        load_permissions(users)
+        return Promise.resolve([all_permissions(i) for i in users])
+
+
 class User(NodeMixin, DjangoObjectType):
     permissions = graphene.List(graphene.String)
 
@@ -19,7 +30,12 @@ class User(NodeMixin, DjangoObjectType):
         convert_choices_to_enum = False
 
     def resolve_permissions(root, info):
-        return all_permissions(root)
+        loaders = get_context_loaders(info)
+        if loaders is None:
+            return all_permissions(root)
+        if PermissionsLoader not in loaders:
+            loaders[PermissionsLoader] = PermissionsLoader()
+        return loaders[PermissionsLoader].load(root)
 
 
 class Group(NodeMixin, DjangoObjectType):
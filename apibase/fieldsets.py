@@ -0,0 +1,157 @@
+"""
+sparse fieldsets: `?fields=a,b,c.d` / `?exclude=...`
+
+- dotted paths select fields of nested serializers
+- the pruned serializer decides joins (planners) and the columns loaded with `.only()`
+- requested paths are reduced to the serializer's field names before they key a cached plan
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from . import planners, serializers as apibase_serializers
+
+
+def parse(value):
+    """ "b,a.c, a" -> ("a", "a.c", "b")"""
+    if not value:
+        return ()
+    return tuple(sorted({i.strip() for i in value.split(",") if i.strip()}))
+
+
+def to_tree(paths):
+    """("a", "b.c") -> {"a": None, "b": {"c": None}}: None selects the whole field"""
+    tree = {}
+    for path in paths:
+        node = tree
+        *parents, name = path.split(".")
+        for parent in parents:
+            if parent in node and node[parent] is None:
+                break
+            node = node.setdefault(parent, {})
+        else:
+            node[name] = None
+    return tree
+
+
+def nested_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    return field if isinstance(field, serializers.BaseSerializer) else None
+
+
+def prune(serializer, include=None, exclude=None):
+    """drop fields from `serializer` (or the child of a list serializer) in place"""
+    serializer = nested_serializer(serializer)
+    fields = serializer.fields
+
+    if include is not None:
+        for name in list(fields):
+            if name not in include:
+                fields.pop(name)
+            elif include[name] and nested_serializer(fields[name]):
+                prune(fields[name], include=include[name])
+
+    for name, sub in (exclude or {}).items():
+        if name not in fields:
+            continue
+        if sub is None:
+            fields.pop(name)
+        elif nested_serializer(fields[name]):
+            prune(fields[name], exclude=sub)
+
+    return serializer
+
+
+def only_fields(serializer, model, prefix=""):
+    """
+    columns needed to render `serializer`, None when they can not be known
+    (`__str__`, `patch_result`, method fields or properties)
+    """
+    serializer = nested_serializer(serializer)
+    if hasattr(serializer, "patch_result"):
+        return None
+
+    columns = [f"{prefix}{model._meta.pk.name}"]
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, (apibase_serializers.EndpointField, apibase_serializers.UrnField)):
+            if field.attr_name or hasattr(model, "get_endpoint_url"):
+                return None
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or not field.source_attrs:
+            return None
+
+        name = field.source_attrs[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            model_field = planners.get_relation(model, name)
+        if not model_field or (model_field.is_relation and not model_field.related_model):
+            # properties or GenericForeignKey
+            return None
+
+        if not model_field.is_relation:
+            columns.append(f"{prefix}{name}")
+        elif model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+            columns.append(f"{prefix}{name}")
+            nested = nested_serializer(field)
+            if nested is not None and len(field.source_attrs) == 1:
+                related = only_fields(nested, model_field.related_model, prefix=f"{prefix}{name}__")
+                if related is None:
+                    return None
+                columns.extend(related)
+        elif model_field.one_to_one:
+            # reverse one-to-one joined by select_related
+            return None
+
+    return columns
+
+
+def field_tree(serializer):
+    """{name: None, or the tree of a nested serializer} of the fields of `serializer`"""
+    serializer = nested_serializer(serializer)
+    return {name: field_tree(field) if nested_serializer(field) else None for name, field in serializer.fields.items()}
+
+
+_field_trees = {}
+
+
+def get_field_tree(view):
+    """field tree of the serializer of `view`, once per (view class, serializer class)"""
+    serializer_class = view.get_serializer_class()
+    key = (type(view), serializer_class)
+    tree = _field_trees.get(key)
+    if tree is None:
+        tree = _field_trees[key] = field_tree(serializer_class(context=view.get_serializer_context()))
+    return tree
+
+
+def known_paths(tree, paths, exclude=False):
+    """
+    `paths` reduced to the field names of `tree`: paths of unknown fields are dropped,
+    a path below a field that is not a serializer selects the whole field (and excludes nothing)
+    """
+    known = set()
+    for path in paths:
+        node, names = tree, []
+        for name in path.split("."):
+            if node is None:
+                names = None if exclude else names
+                break
+            if name not in node:
+                names = None
+                break
+            names.append(name)
+            node = node[name]
+        if names:
+            known.add(".".join(names))
+    return tuple(sorted(known))
+
+
+def plan_fieldset(serializer, model):
+    """queryset plan for a pruned serializer, with the columns it renders"""
+    plan = planners.plan_serializer(serializer, model)
+    plan.only = only_fields(serializer, model)
+    return plan
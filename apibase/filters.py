@@ -9,9 +9,12 @@ from functools import reduce
 import django_filters
 import jaconv
 from django import forms
-from django.db.models import IntegerField, Q
+from django.core.cache import cache
+from django.db.models import Exists, IntegerField, OuterRef, Q, signals
+from django_filters.utils import get_field_parts
 
 from .fields import CharRangeField, ListCharField, ListIntegerField, MonthRangeField
+from .settings import apibase_settings
 
 
 class IntFilter(django_filters.NumberFilter):
@@ -22,9 +25,11 @@ SPACES = r"[\s\u3000,]+"
 
 
 class WordFilter(django_filters.CharFilter):
-    def __init__(self, *args, lookups=None, delimiters=None, **kwargs):
+    def __init__(self, *args, lookups=None, delimiters=None, backend=None, **kwargs):
         self.lookups = lookups or []
         self.delimiters = delimiters or SPACES
+        # search.DocumentSearch: index-backed search, LIKE when it returns None
+        self.backend = backend
         kwargs["lookup_expr"] = kwargs.get("lookup_expr", "contains")
         super().__init__(*args, **kwargs)
 
@@ -32,6 +37,11 @@ class WordFilter(django_filters.CharFilter):
         if value in django_filters.constants.EMPTY_VALUES:
             return qs
 
+        if self.backend:
+            res = self.backend.filter(qs, [v for v in re.split(self.delimiters, value) if v])
+            if res is not None:
+                return res.distinct() if self.distinct else res
+
         def _q(lookup, val):
             key = f"{lookup}__{self.lookup_expr}"
             vals = set(
@@ -70,9 +80,57 @@ class ListIntegerInFilter(ListCharInFilter):
     field_class = ListIntegerField
 
 
+def is_multivalued(model, field_name):
+    """`field_name` path crosses a M2M or reverse FK relation"""
+    parts = get_field_parts(model, field_name) or []
+    return any(getattr(i, "many_to_many", False) or getattr(i, "one_to_many", False) for i in parts)
+
+
+def filter_paths(filter_field):
+    return [filter_field.field_name, *getattr(filter_field, "lookups", [])]
+
+
 class BaseFilter(django_filters.FilterSet):
+    # how filters across multi-valued relations avoid duplicated rows:
+    # - "distinct": the filter's `distinct` (SELECT DISTINCT)
+    # - "exists": correlated EXISTS subquery
+    # - "in": `pk IN (subquery)`
+    multivalued_strategy = "distinct"
+
     pk = django_filters.NumberFilter(field_name="id")
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.subquery_filters = set()
+        if self.multivalued_strategy == "distinct":
+            return
+        model = self.queryset.model
+        for name, filter_field in self.filters.items():
+            if filter_field.distinct or any(is_multivalued(model, i) for i in filter_paths(filter_field)):
+                self.subquery_filters.add(name)
+                filter_field.distinct = False
+
+    def filter_queryset(self, queryset):
+        if not self.subquery_filters:
+            return super().filter_queryset(queryset)
+
+        for name, value in self.form.cleaned_data.items():
+            filter_field = self.filters[name]
+            if name not in self.subquery_filters:
+                queryset = filter_field.filter(queryset, value)
+                continue
+
+            # filtered in a subquery: the joins never reach `queryset`
+            rows = queryset.model._base_manager.all()
+            filtered = filter_field.filter(rows, value)
+            if filtered is rows:
+                continue
+            if self.multivalued_strategy == "in":
+                queryset = queryset.filter(pk__in=filtered.order_by().values("pk"))
+            else:
+                queryset = queryset.filter(Exists(filtered.filter(pk=OuterRef("pk"))))
+        return queryset
+
     id__includes = ListIntegerInFilter(label="ID(PK)", field_name="id", help_text="includes id set in csv")
 
     id__excludes = ListIntegerInFilter(
@@ -107,16 +165,66 @@ class BaseFilter(django_filters.FilterSet):
     )
 
 
+CHOICES_VERSION_KEY = "apibase:choices:version:{}"
+# labels of the models whose choices are cached, see `connect_choices_invalidation`
+choices_models = set()
+
+
+def bump_choices_version(sender, **kwargs):
+    """post_save/post_delete: expire cached choices of `sender`"""
+    key = CHOICES_VERSION_KEY.format(sender._meta.label)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def connect_choices_invalidation(models):
+    """expire cached choices on changes of `models` (AppConfig.ready)"""
+    for model in models:
+        uid = f"apibase_choices_{model._meta.label}"
+        signals.post_save.connect(bump_choices_version, sender=model, dispatch_uid=uid)
+        signals.post_delete.connect(bump_choices_version, sender=model, dispatch_uid=uid)
+        choices_models.add(model._meta.label)
+
+
 class AllValuesMultipleFilter(django_filters.AllValuesMultipleFilter):
     # field_class: django_filters.fields.MultipleChoiceField
 
+    def __init__(self, *args, choices_timeout=None, max_choices=None, **kwargs):
+        # seconds to keep the choices in the cache (0: not cached), APIBASE FILTER_CHOICES_TIMEOUT by default
+        self.choices_timeout = choices_timeout
+        self.max_choices = max_choices
+        super().__init__(*args, **kwargs)
+
+    def get_choices(self):
+        """
+        distinct values of the field, cached for models of `FILTER_CHOICES_MODELS`
+        and expired by saving/deleting a row of the model
+        """
+        model = self.model
+        qs = model._default_manager.distinct()
+        qs = qs.order_by(self.field_name).values_list(self.field_name, flat=True)
+        if self.max_choices:
+            qs = qs[: self.max_choices]
+
+        timeout = apibase_settings.FILTER_CHOICES_TIMEOUT if self.choices_timeout is None else self.choices_timeout
+        if not timeout or model._meta.label not in choices_models:
+            return [(o, o) for o in qs]
+
+        version = cache.get(CHOICES_VERSION_KEY.format(model._meta.label), 0)
+        key = f"apibase:choices:{model._meta.label}:{self.field_name}:{self.max_choices}:{version}"
+        choices = cache.get(key)
+        if choices is None:
+            choices = [(o, o) for o in qs]
+            cache.set(key, choices, timeout)
+        return choices
+
     @property
     def field(self):
         # not cache as '_field' to work with `choices`
         if hasattr(self, "model"):
-            qs = self.model._default_manager.distinct()
-            qs = qs.order_by(self.field_name).values_list(self.field_name, flat=True)
-            self.extra["choices"] = [(o, o) for o in qs]
+            self.extra["choices"] = self.get_choices()
         field_kwargs = self.extra.copy()
         return self.field_class(label=self.label, **field_kwargs)
 
@@ -162,7 +270,12 @@ def clone_filter_fields(filter_class, prefix, distinct=None, fields=None, exclud
     }
 
 
-def make_related_filterset(type_name, distinct=True, base_filters=None, **related_filters):
+def make_related_filterset(
+    type_name, distinct=True, base_filters=None, multivalued_strategy="exists", **related_filters
+):
+    """
+    multivalued_strategy: BaseFilter.multivalued_strategy of the filterset ("distinct" for SELECT DISTINCT)
+    """
     base_filters = base_filters or (BaseFilter,)
     fields = reduce(
         lambda a, b: {**a, **b},
@@ -171,6 +284,7 @@ def make_related_filterset(type_name, distinct=True, base_filters=None, **relate
             for prefix, filter_class in related_filters.items()
         ],
     )
+    fields["multivalued_strategy"] = multivalued_strategy
     return type(type_name, base_filters, fields)
 
 
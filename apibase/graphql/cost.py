@@ -0,0 +1,125 @@
+"""
+static cost analysis of a GraphQL document, before execution
+
+- every connection field costs its type's `cost_weight` (`NodeSet(cost_weight=...)`, default 1)
+  times the page sizes (`first`/`last`, else the max limit) of the connections above it
+- depth is the number of nested connections
+"""
+
+from graphene.relay import Connection
+from graphene_django.settings import graphene_settings
+from graphql.language import ast
+
+from ..settings import apibase_settings
+from .lookahead import is_included, unwrap
+
+
+class QueryCost:
+    def __init__(self, cost=0, depth=0):
+        self.cost = cost
+        self.depth = depth
+
+    def get_errors(self, max_cost=None, max_depth=None):
+        """messages of the exceeded limits"""
+        errors = []
+        if max_cost is not None and self.cost > max_cost:
+            errors.append(f"Query cost {self.cost} exceeds the maximum cost of {max_cost}.")
+        if max_depth is not None and self.depth > max_depth:
+            errors.append(f"Query depth {self.depth} exceeds the maximum depth of {max_depth}.")
+        return errors
+
+    def as_dict(self):
+        return {"cost": self.cost, "depth": self.depth}
+
+
+class Analyzer:
+    def __init__(self, schema, document, variables=None):
+        self.schema = schema
+        self.variable_values = variables or {}
+        self.fragments = {i.name.value: i for i in document.definitions if isinstance(i, ast.FragmentDefinition)}
+        self.operations = [i for i in document.definitions if isinstance(i, ast.OperationDefinition)]
+        self.default_page_size = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+
+    def get_operation(self, operation_name=None):
+        if operation_name:
+            return next((i for i in self.operations if i.name and i.name.value == operation_name), None)
+        return self.operations[0] if len(self.operations) == 1 else None
+
+    def get_root_type(self, operation):
+        if operation.operation == "mutation":
+            return self.schema.get_mutation_type()
+        if operation.operation == "subscription":
+            return self.schema.get_subscription_type()
+        return self.schema.get_query_type()
+
+    def get_argument(self, node, name):
+        for argument in node.arguments or []:
+            if argument.name.value != name:
+                continue
+            value = argument.value
+            if isinstance(value, ast.Variable):
+                value = self.variable_values.get(value.name.value)
+                return value if isinstance(value, int) else None
+            if isinstance(value, ast.IntValue):
+                return int(value.value)
+        return None
+
+    def get_page_size(self, node, graphene_type):
+        sizes = [i for i in (self.get_argument(node, "first"), self.get_argument(node, "last")) if i is not None]
+        if sizes:
+            return max(0, min(sizes))
+        return getattr(graphene_type, "cost_max_limit", None) or self.default_page_size or 1
+
+    def fields(self, selection_set):
+        """field nodes of a selection set, fragments inlined"""
+        for item in getattr(selection_set, "selections", None) or []:
+            if not is_included(self, item, {}):
+                continue
+            if isinstance(item, ast.Field):
+                yield item
+            elif isinstance(item, ast.FragmentSpread):
+                fragment = self.fragments.get(item.name.value)
+                if fragment:
+                    yield from self.fields(fragment.selection_set)
+            elif isinstance(item, ast.InlineFragment):
+                yield from self.fields(item.selection_set)
+
+    def walk(self, gql_type, selection_set, multiplier=1):
+        """(cost, depth) of a selection set on `gql_type` fetched `multiplier` times"""
+        cost = depth = 0
+        fields = getattr(gql_type, "fields", None) or {}
+        for node in self.fields(selection_set):
+            field = fields.get(node.name.value)
+            if field is None or not node.selection_set:
+                continue
+
+            field_type = unwrap(field.type)
+            graphene_type = getattr(field_type, "graphene_type", None)
+            if isinstance(graphene_type, type) and issubclass(graphene_type, Connection):
+                page_size = self.get_page_size(node, graphene_type)
+                cost += getattr(graphene_type, "cost_weight", 1) * multiplier
+                child_cost, child_depth = self.walk(field_type, node.selection_set, multiplier * page_size)
+                depth = max(depth, child_depth + 1)
+            else:
+                child_cost, child_depth = self.walk(field_type, node.selection_set, multiplier)
+                depth = max(depth, child_depth)
+            cost += child_cost
+        return cost, depth
+
+    def analyze(self, operation_name=None):
+        operation = self.get_operation(operation_name)
+        root_type = operation and self.get_root_type(operation)
+        if root_type is None:
+            return QueryCost()
+        return QueryCost(*self.walk(root_type, operation.selection_set))
+
+
+def analyze(schema, document, operation_name=None, variables=None):
+    """QueryCost of parsed `document`"""
+    return Analyzer(schema, document, variables).analyze(operation_name)
+
+
+def check(schema, document, operation_name=None, variables=None):
+    """(QueryCost, error messages) with the APIBASE GQL_MAX_COST/GQL_MAX_DEPTH limits"""
+    cost = analyze(schema, document, operation_name=operation_name, variables=variables)
+    return cost, cost.get_errors(apibase_settings.GQL_MAX_COST, apibase_settings.GQL_MAX_DEPTH)
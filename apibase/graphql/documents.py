@@ -0,0 +1,110 @@
+"""
+parsed and validated GraphQL documents
+
+- documents are kept in an LRU keyed by (schema, sha256 of the source)
+- one gql Client per schema for server side queries (`utils.gql_query`)
+- `CachedDocumentBackend` for GraphQLView
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from gql import Client
+from graphql import parse
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend, execute_and_validate
+from graphql.execution import ExecutionResult
+from graphql.validation import validate
+
+from ..settings import apibase_settings
+
+
+class DocumentCache:
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self.documents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return apibase_settings.GQL_DOCUMENT_CACHE_SIZE if self._maxsize is None else self._maxsize
+
+    def validated(self, schema, source):
+        """(parsed `source`, validation errors against `schema`): only valid documents are kept"""
+        key = (schema, hashlib.sha256(source.encode()).hexdigest())
+        with self.lock:
+            document = self.documents.get(key)
+            if document is not None:
+                self.hits += 1
+                self.documents.move_to_end(key)
+                return document, []
+            self.misses += 1
+
+        document = parse(source)
+        errors = validate(schema, document)
+        if errors:
+            return document, errors
+
+        with self.lock:
+            if self.maxsize:
+                self.documents[key] = document
+                while len(self.documents) > self.maxsize:
+                    self.documents.popitem(last=False)
+        return document, []
+
+    def get(self, schema, source):
+        """parsed `source` validated against `schema`, raises the first validation error"""
+        document, errors = self.validated(schema, source)
+        if errors:
+            raise errors[0]
+        return document
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.documents), "maxsize": self.maxsize}
+
+    def clear(self):
+        with self.lock:
+            self.documents.clear()
+            self.hits = self.misses = 0
+
+
+class CachedDocumentBackend(GraphQLCoreBackend):
+    """GraphQLCoreBackend parsing and validating each query string once"""
+
+    def __init__(self, executor=None, cache=None):
+        super().__init__(executor=executor)
+        self.cache = cache or document_cache
+
+    def document_from_string(self, schema, document_string):
+        if not isinstance(document_string, str):
+            return super().document_from_string(schema, document_string)
+
+        document_ast, errors = self.cache.validated(schema, document_string)
+        if errors:
+
+            def execute(*args, **kwargs):
+                return ExecutionResult(errors=errors, invalid=True)
+
+        else:
+            execute = partial(execute_and_validate, schema, document_ast, validate=False, **self.execute_params)
+
+        return GraphQLDocument(
+            schema=schema, document_string=document_string, document_ast=document_ast, execute=execute
+        )
+
+
+document_cache = DocumentCache()
+cached_backend = CachedDocumentBackend()
+_clients = {}
+
+
+def get_client(schema):
+    """gql Client (local schema transport) of `schema`"""
+    client = _clients.get(schema)
+    if client is None:
+        client = _clients[schema] = Client(schema=schema)
+    return client
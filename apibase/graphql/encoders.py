@@ -9,3 +9,15 @@ class JSONEncode(DjangoJSONEncoder):
             return float(o)
 
         return super().default(o)
+
+
+def json_safe(value, encoder=None):
+    """`json.loads(json.dumps(value, cls=JSONEncode))` without the round trip"""
+    encoder = encoder or JSONEncode()
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): json_safe(v, encoder) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(i, encoder) for i in value]
+    return json_safe(encoder.default(value), encoder)
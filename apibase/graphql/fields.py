@@ -1,8 +1,12 @@
 # https://docs.graphene-python.org/projects/django/en/latest/queries/
+from functools import partial
+
 from django_filters.utils import get_field_parts
 from graphene_django.filter import DjangoFilterConnectionField
+from promise import Promise
 
 from .. import filters, utils
+from . import loaders, lookahead
 from .connections import FilteringConnection
 
 
@@ -73,6 +77,8 @@ def _needs_distinct(qs, args, filterset_class):
     """
     if not filterset_class:
         return False
+    if getattr(filterset_class, "multivalued_strategy", None) in ("exists", "in"):
+        return False  # multi-valued relations are filtered in subqueries (filters.BaseFilter)
 
     model = filterset_class._meta.model
     base_filters = filterset_class.base_filters
@@ -98,18 +104,102 @@ class NodeSet(DjangoFilterConnectionField):
 
     def __init__(self, *args, **kwargs):
         name_prefix = kwargs.pop("name_prefix", "")
+        # nested under a list: fetch the pages of all parents at once
+        batched = kwargs.pop("batched", False)
+        # query cost of the connection (see graphql.cost)
+        cost_weight = kwargs.pop("cost_weight", 1)
         super().__init__(*args, **kwargs)
         self.name_prefix = name_prefix
+        self.batched = batched
+        self.cost_weight = cost_weight
 
     @property
     def type(self):
         class NodeSetConnection(FilteringConnection):
+            cost_weight = self.cost_weight
+            cost_max_limit = self.max_limit
+
             class Meta:
                 node = self._type
                 name = f"{self.name_prefix}{self._type._meta.name}NodeSetConnection"
 
         return NodeSetConnection
 
+    def get_resolver(self, parent_resolver):
+        resolver = super().get_resolver(parent_resolver)
+        if not self.batched:
+            return resolver
+        return partial(self.batched_resolver, resolver)
+
+    def batched_resolver(self, resolver, root, info, **args):
+        loader = None
+        if lookahead.get_prefetched(root, info, args) is None:
+            loader = loaders.get_connection_loader(info, root, self, args)
+        if loader is None:
+            return resolver(root, info, **args)
+
+        def load(root, info, **args):
+            return loader.load(root.pk)
+
+        def resolve_window(connection, iterable, info, args):
+            return iterable
+
+        return self.connection_resolver(
+            load,
+            self.connection_type,
+            self.get_manager(),
+            resolve_window,
+            self.max_limit,
+            self.enforce_first_or_last,
+            root,
+            info,
+            **args,
+        )
+
+    @classmethod
+    def connection_resolver(
+        cls,
+        resolver,
+        connection,
+        default_manager,
+        queryset_resolver,
+        max_limit,
+        enforce_first_or_last,
+        root,
+        info,
+        **args,
+    ):
+        prefetched = lookahead.get_prefetched(root, info, args)
+        if prefetched is not None:
+            # rows loaded by the lookahead of the parent queryset
+
+            def resolver(root, info, **args):
+                return prefetched
+
+            def queryset_resolver(connection, iterable, info, args):
+                return iterable
+
+        result = super().connection_resolver(
+            resolver,
+            connection,
+            default_manager,
+            queryset_resolver,
+            max_limit,
+            enforce_first_or_last,
+            root,
+            info,
+            **args,
+        )
+
+        def set_selected_fields(connection):
+            # SummaryMixin computes the selected totals together
+            connection.selected_fields = {i.name.value for i in lookahead.selected_fields(info)}
+            return connection
+
+        if Promise.is_thenable(result):
+            return Promise.resolve(result).then(set_selected_fields)
+        return set_selected_fields(result)
+
     @classmethod
     def resolve_connection(cls, connection, args, iterable, *nargs, **kwargs):
         # connectioon: NodeSetConnection
@@ -117,6 +207,8 @@ class NodeSet(DjangoFilterConnectionField):
         # iterable: QuerySet
 
         connection = super().resolve_connection(connection, args, iterable, *nargs, **kwargs)
+        if isinstance(iterable, loaders.Window):
+            connection.iterable = iterable.queryset
 
         start_offset = utils.resolve_start_offset(0, args.get("after"))
         connection.page_info.has_previous_page = start_offset > 0
@@ -136,6 +228,7 @@ class NodeSet(DjangoFilterConnectionField):
     @classmethod
     def resolve_queryset(cls, connection, iterable, info, args, filtering_args, filterset_class):
         qs = super().resolve_queryset(connection, iterable, info, args, filtering_args, filterset_class)
+        qs = lookahead.apply(qs, info)
 
         # Apply distinct() only when needed (M2M, reverse FK, or explicit distinct=True)
         if _needs_distinct(qs, args, filterset_class):
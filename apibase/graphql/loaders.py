@@ -0,0 +1,258 @@
+"""
+per-request DataLoaders
+
+- keys requested in one execution tick are fetched with one `pk__in` query per node type
+- rows are filtered by the node type's `get_queryset` (permissions)
+- pages of nested NodeSet(batched=True) connections are fetched for all parents at once
+- loaders live on `info.context` (the request) and cache rows for its lifetime
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models import Count, F, Window as WindowExpression
+from django.db.models.functions import RowNumber
+from graphql_relay.connection.arrayconnection import get_offset_with_default
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from .. import planners
+from . import lookahead
+
+CONTEXT_ATTR = "_apibase_loaders"
+
+
+class ModelLoader(DataLoader):
+    def __init__(self, node_type, info):
+        super().__init__()
+        self.node_type = node_type
+        self.info = info
+
+    @property
+    def model(self):
+        return self.node_type._meta.model
+
+    def get_queryset(self):
+        queryset = self.model._default_manager.all()
+        if hasattr(self.node_type, "get_queryset"):
+            queryset = self.node_type.get_queryset(queryset, self.info)
+        return queryset
+
+    def batch_load_fn(self, keys):
+        objects = {obj.pk: obj for obj in self.get_queryset().filter(pk__in=set(keys))}
+        return Promise.resolve([objects.get(key) for key in keys])
+
+    def load(self, key):
+        return super().load(self.model._meta.pk.to_python(key))
+
+
+def get_context_loaders(info):
+    """loaders of the request, None without a context to keep them on"""
+    context = info.context
+    if context is None:
+        return None
+
+    loaders = getattr(context, CONTEXT_ATTR, None)
+    if loaders is None:
+        loaders = {}
+        try:
+            setattr(context, CONTEXT_ATTR, loaders)
+        except AttributeError:
+            return None
+    return loaders
+
+
+def get_loader(info, node_type):
+    """ModelLoader of `node_type` for the request, None without a context to keep it on"""
+    loaders = get_context_loaders(info)
+    if loaders is None:
+        return None
+    if node_type not in loaders:
+        loaders[node_type] = ModelLoader(node_type, info)
+    return loaders[node_type]
+
+
+class Window:
+    """
+    rows [start, start + len(rows)) of a connection with `length` rows,
+    sliced by `NodeSet.resolve_connection` like a queryset
+    """
+
+    def __init__(self, rows, start, length, queryset):
+        self.rows = rows
+        self.start = start
+        self.length = length
+        # for SummaryMixin
+        self.queryset = queryset
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        assert isinstance(key, slice) and key.start in (self.start, self.length), key
+        return self.rows if key.start == self.start else []
+
+
+def get_window(args, max_limit=None):
+    """(start, size) of a connection page, None for `last`/`before` (not batched)"""
+    if args.get("last") is not None or args.get("before") is not None:
+        return None
+    start = get_offset_with_default(args.get("after"), -1) + 1
+    if args.get("offset"):
+        # see DjangoConnectionField.resolve_connection
+        start = args["offset"] + (start if args.get("after") else 0)
+
+    size = args.get("first")
+    if max_limit is not None:
+        size = max_limit if size is None else min(size, max_limit)
+    return start, size
+
+
+def get_ordering(queryset):
+    """ordering expressions of `queryset`, ending with the pk"""
+    query = queryset.query
+    ordering = list(query.order_by or (query.get_meta().ordering if query.default_ordering else []))
+    res = []
+    for item in ordering + ["pk"]:
+        if hasattr(item, "resolve_expression"):
+            res.append(item)
+        elif item != "?":
+            res.append(F(item[1:]).desc() if item.startswith("-") else F(item).asc())
+    return res
+
+
+class ConnectionLoader(DataLoader):
+    """
+    one page of a nested connection for every parent key
+
+    - ROW_NUMBER() OVER (PARTITION BY <parent>) where the backend supports it
+    - all rows of the parents grouped in Python otherwise
+    """
+
+    def __init__(self, queryset, lookup, start, size):
+        super().__init__()
+        self.queryset = queryset
+        self.lookup = lookup
+        self.start = start
+        self.size = size
+
+    def get_counts(self, queryset):
+        counts = queryset.order_by().values_list(self.lookup).annotate(count=Count("pk", distinct=True))
+        return dict(counts)
+
+    def get_ranked_pks(self, queryset):
+        """[(pk, parent)] of the page of every parent, in order"""
+        ranked = queryset.annotate(
+            _parent=F(self.lookup),
+            _row=WindowExpression(RowNumber(), partition_by=F(self.lookup), order_by=get_ordering(queryset)),
+        ).values_list("pk", "_parent", "_row")
+        sql, params = ranked.query.sql_with_params()
+
+        connection = connections[queryset.db]
+        row = connection.ops.quote_name("_row")
+        sql = f"SELECT * FROM ({sql}) ranked WHERE ranked.{row} > %s"
+        params = (*params, self.start)
+        if self.size is not None:
+            sql = f"{sql} AND ranked.{row} <= %s"
+            params = (*params, self.start + self.size)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} ORDER BY 2, 3", params)
+            return [(pk, parent) for pk, parent, _ in cursor.fetchall()]
+
+    def get_pages(self, queryset):
+        """{parent: [row, ...]}"""
+        pages = {}
+        if connections[queryset.db].features.supports_over_clause:
+            ranked = self.get_ranked_pks(queryset)
+            objects = self.queryset.in_bulk({pk for pk, _ in ranked}) if ranked else {}
+            for pk, parent in ranked:
+                pages.setdefault(parent, []).append(objects[pk])
+            return pages
+
+        end = None if self.size is None else self.start + self.size
+        for obj in queryset.annotate(_parent=F(self.lookup)):
+            pages.setdefault(obj._parent, []).append(obj)
+        return {parent: rows[self.start : end] for parent, rows in pages.items()}
+
+    def batch_load_fn(self, keys):
+        queryset = self.queryset.filter(**{f"{self.lookup}__in": set(keys)})
+        counts = self.get_counts(queryset)
+        pages = self.get_pages(queryset)
+        return Promise.resolve(
+            [
+                Window(pages.get(key, []), self.start, counts.get(key, 0), self.queryset.filter(**{self.lookup: key}))
+                for key in keys
+            ]
+        )
+
+
+def get_parent_lookup(model, name):
+    """lookup from the rows of to-many relation `name` of `model` back to it"""
+    relation = planners.get_relation(model, name)
+    if not relation or not (relation.one_to_many or relation.many_to_many):
+        return None
+    if relation.concrete:
+        # forward M2M
+        return relation.related_query_name()
+    if not relation.field.target_field.primary_key:
+        # `to_field`
+        return None
+    return relation.field.name
+
+
+def get_connection_loader(info, root, field, args):
+    """ConnectionLoader of a NodeSet `field` nested under model instance `root`"""
+    if not isinstance(root, models.Model):
+        return None
+    window = get_window(args, field.max_limit)
+    loaders = get_context_loaders(info)
+    if window is None or loaders is None:
+        return None
+
+    name, _ = lookahead.get_field(info.parent_type.graphene_type, info.field_name)
+    lookup = name and get_parent_lookup(type(root), name)
+    if not lookup:
+        return None
+
+    key = (field, info.field_name, repr(sorted(args.items())))
+    if key not in loaders:
+        queryset = field.get_queryset_resolver()(field.connection_type, field.get_manager(), info, args)
+        loaders[key] = ConnectionLoader(queryset, lookup, *window)
+    return loaders[key]
+
+
+def get_node_type(info):
+    """graphene type of the field being resolved"""
+    return_type = info.return_type
+    while hasattr(return_type, "of_type"):
+        # NonNull
+        return_type = return_type.of_type
+    return getattr(return_type, "graphene_type", None)
+
+
+def load_related(root, attname, info):
+    """
+    Promise of the forward FK/O2O `attname` of model instance `root` through the loader,
+    None when it can not be batched (not a relation, already cached, no context)
+    """
+    if not isinstance(root, models.Model):
+        return None
+    try:
+        field = root._meta.get_field(attname)
+    except FieldDoesNotExist:
+        return None
+    if not (field.concrete and (field.many_to_one or field.one_to_one)) or field.is_cached(root):
+        return None
+    if not field.target_field.primary_key:
+        # `to_field`
+        return None
+
+    node_type = get_node_type(info)
+    if getattr(getattr(node_type, "_meta", None), "model", None) is not field.related_model:
+        return None
+
+    key = getattr(root, field.attname)
+    if key is None:
+        return Promise.resolve(None)
+    loader = get_loader(info, node_type)
+    return loader and loader.load(key)
@@ -0,0 +1,238 @@
+"""
+selection-set lookahead for NodeSet querysets
+
+- selected forward FK/O2O and reverse O2O are joined with `select_related`
+- selected NodeSet connections of reverse FK/M2M are loaded with `Prefetch(to_attr=...)`
+  and served from it when no filter argument is given
+- selected scalar columns are loaded with `.only()` when every selected field is known to be a column
+- plans are cached per (type, selection) of the document
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.relay import Connection
+from graphene.types.dynamic import Dynamic
+from graphene.utils.str_converters import to_camel_case
+from graphql.language import ast
+
+from .. import planners
+
+PAGINATION_ARGS = {"first", "last", "before", "after", "offset"}
+PREFETCH_ATTR = "_lookahead_{}"
+PLAN_CACHE_SIZE = 512
+
+# plans by (type, document, location), shared by the threads serving requests
+_plans = planners.PlanCache(maxsize=PLAN_CACHE_SIZE)
+
+
+class Selection:
+    def __init__(self):
+        self.args = set()
+        self.fields = {}
+
+
+def unwrap(gql_type):
+    """strip NonNull/List"""
+    while hasattr(gql_type, "of_type"):
+        gql_type = gql_type.of_type
+    return gql_type
+
+
+def is_included(info, node, state):
+    for directive in node.directives or []:
+        if directive.name.value not in ("skip", "include"):
+            continue
+        value = next((i.value for i in directive.arguments if i.name.value == "if"), None)
+        if isinstance(value, ast.Variable):
+            # depends on variables: the plan can not be shared between requests
+            state["cacheable"] = False
+            value = (info.variable_values or {}).get(value.name.value)
+        else:
+            value = getattr(value, "value", value)
+        if (directive.name.value == "skip") == bool(value):
+            return False
+    return True
+
+
+def collect(info, nodes, state, selection=None):
+    """merge the selection sets of field `nodes` (fragments inlined) into a Selection tree"""
+    selection = selection or Selection()
+    for node in nodes:
+        for item in getattr(node.selection_set, "selections", None) or []:
+            if not is_included(info, item, state):
+                continue
+            if isinstance(item, ast.Field):
+                child = selection.fields.setdefault(item.name.value, Selection())
+                child.args.update(i.name.value for i in item.arguments or [])
+                collect(info, [item], state, child)
+            elif isinstance(item, ast.FragmentSpread):
+                collect(info, [info.fragments[item.name.value]], state, selection)
+            elif isinstance(item, ast.InlineFragment):
+                collect(info, [item], state, selection)
+    return selection
+
+
+def selected_fields(info):
+    """Field nodes directly selected on the field being resolved (fragments inlined, directives ignored)"""
+    res = []
+    nodes = list(info.field_asts)
+    while nodes:
+        for item in getattr(nodes.pop().selection_set, "selections", None) or []:
+            if isinstance(item, ast.Field):
+                res.append(item)
+            elif isinstance(item, ast.FragmentSpread):
+                nodes.append(info.fragments[item.name.value])
+            elif isinstance(item, ast.InlineFragment):
+                nodes.append(item)
+    return res
+
+
+def connection_node(gql_type, selection):
+    """(node type, node selection) of a connection type"""
+    graphene_type = getattr(gql_type, "graphene_type", None)
+    if not (isinstance(graphene_type, type) and issubclass(graphene_type, Connection)):
+        return gql_type, selection
+    edges = selection.fields.get("edges")
+    node = edges and edges.fields.get("node")
+    node_type = unwrap(unwrap(gql_type.fields["edges"].type).fields["node"].type)
+    return node_type, node or Selection()
+
+
+def get_field(graphene_type, gql_name):
+    """(python name, graphene field) of a GraphQL field"""
+    for name, field in graphene_type._meta.fields.items():
+        if gql_name in (getattr(field, "name", None), name, to_camel_case(name)):
+            return name, (field.get_type() if isinstance(field, Dynamic) else field)
+    return None, None
+
+
+class LookaheadPlan:
+    def __init__(self, select_related=None, prefetches=None, only=None):
+        self.select_related = select_related or []
+        # [(path, to_attr, node gql type, LookaheadPlan)]
+        self.prefetches = prefetches or []
+        self.only = only
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetches or self.only)
+
+    def apply(self, queryset, info):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        for path, to_attr, node_type, plan in self.prefetches:
+            node_type = node_type.graphene_type
+            related = node_type.get_queryset(node_type._meta.model._default_manager.all(), info)
+            queryset = queryset.prefetch_related(Prefetch(path, queryset=plan.apply(related, info), to_attr=to_attr))
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+class Planner:
+    def __init__(self):
+        self.select_related = []
+        self.prefetches = []
+        self.only = []
+
+    def walk(self, gql_type, selection, prefix=""):
+        graphene_type = gql_type.graphene_type
+        model = getattr(graphene_type._meta, "model", None)
+        if model is None:
+            return False
+        known = not hasattr(graphene_type, "patch_result")
+        columns = getattr(graphene_type, "lookahead_columns", {})
+
+        self.only.append(f"{prefix}{model._meta.pk.name}")
+        for gql_name, child in selection.fields.items():
+            if gql_name == "__typename":
+                continue
+            if gql_name == "id" or gql_name in columns:
+                self.only.extend(f"{prefix}{i}" for i in columns.get(gql_name, ()))
+                continue
+
+            name, field = get_field(graphene_type, gql_name)
+            if not name or getattr(field, "resolver", None) or hasattr(graphene_type, f"resolve_{name}"):
+                # custom resolvers may read anything
+                known = False
+                continue
+
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                model_field = planners.get_relation(model, name)
+            if not model_field:
+                known = False
+                continue
+
+            if not model_field.is_relation:
+                self.only.append(f"{prefix}{name}")
+                continue
+
+            related_type = unwrap(gql_type.fields[gql_name].type)
+            if not model_field.related_model or not hasattr(related_type, "graphene_type"):
+                known = False
+                continue
+
+            path = f"{prefix}{name}"
+            if model_field.many_to_one or model_field.one_to_one:
+                if model_field.concrete:
+                    self.only.append(path)
+                else:
+                    # reverse O2O: columns are not restricted
+                    known = False
+                self.select_related.append(path)
+                known = self.walk(related_type, child, prefix=f"{path}__") and known
+            elif self.is_prefetchable(field, child):
+                node_type, node = connection_node(related_type, child)
+                plan = plan_selection(node_type, node)
+                if plan.only and model_field.one_to_many:
+                    # the FK back to the rows being prefetched for
+                    plan.only.append(model_field.field.name)
+                self.prefetches.append((path, PREFETCH_ATTR.format(gql_name), node_type, plan))
+
+        return known
+
+    def is_prefetchable(self, field, selection):
+        from .fields import NodeSet
+
+        # batched NodeSets page the rows of all parents in one query (loaders.ConnectionLoader)
+        return isinstance(field, NodeSet) and not field.batched and not (selection.args - PAGINATION_ARGS)
+
+
+def plan_selection(gql_type, selection):
+    planner = Planner()
+    known = planner.walk(gql_type, selection)
+    return LookaheadPlan(
+        select_related=planner.select_related,
+        prefetches=planner.prefetches,
+        only=sorted(set(planner.only)) if known else None,
+    )
+
+
+def get_plan(info):
+    """LookaheadPlan of the NodeSet field being resolved"""
+    node = info.field_asts[0]
+    gql_type = unwrap(info.return_type)
+    key = node.loc and (gql_type.name, node.loc.source.body, node.loc.start, node.loc.end)
+    plan = key and _plans.find(key)
+    if plan is not None:
+        return plan
+
+    state = {"cacheable": True}
+    node_type, selection = connection_node(gql_type, collect(info, info.field_asts, state))
+    plan = plan_selection(node_type, selection)
+
+    if key and state["cacheable"]:
+        _plans.put(key, plan)
+    return plan
+
+
+def apply(queryset, info):
+    return get_plan(info).apply(queryset, info)
+
+
+def get_prefetched(root, info, args):
+    """rows loaded by the parent's lookahead Prefetch, None when not available for `args`"""
+    if set(args) - PAGINATION_ARGS:
+        return None
+    return getattr(root, PREFETCH_ATTR.format(info.field_name), None)
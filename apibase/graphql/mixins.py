@@ -1,11 +1,10 @@
-import json
-
 import graphene.relay
-from django.db.models import QuerySet
+from django.db.models import Count, QuerySet
 from graphene.types import generic
 
 from .. import serializers
-from .encoders import JSONEncode
+from . import loaders
+from .encoders import json_safe
 
 
 class NodeMixin:
@@ -15,6 +14,8 @@ class NodeMixin:
     endpoint = graphene.String()
     urn = graphene.String()
     display = graphene.String()
+    # columns read by custom resolvers (lookahead `.only()`)
+    lookahead_columns = {"pk": ()}
 
     def resolve_pk(self, info):
         return self.pk
@@ -33,6 +34,10 @@ class NodeMixin:
 
     @classmethod
     def get_node(cls, info, id):
+        loader = loaders.get_loader(info, cls)
+        if loader:
+            # batched with the other nodes of the request
+            return loader.load(id)
         queryset = cls.get_queryset(cls._meta.model.objects, info)
         try:
             return queryset.get(pk=id)
@@ -41,22 +46,61 @@ class NodeMixin:
 
 
 class SummaryMixin:
+    """
+    - `totalCount` is the length counted for the connection
+    - `records` and `summary` are computed once with one `aggregate()` when the queryset
+      provides `summary_aggregates()` ({name: aggregate expression}), else `summary()` is called
+    """
+
     total_count = graphene.Int()
     records = graphene.Int()
     summary = generic.GenericScalar()
+    # GraphQL field names selected on the connection (set by NodeSet), None if not known
+    selected_fields = None
 
     def resolve_total_count(self, info, **kwargs):
         return self.length
 
     def resolve_summary(self, info, **kwargs):
-        if isinstance(self.iterable, QuerySet) and hasattr(self.iterable, "summary"):
-            data = json.dumps(self.iterable.summary(), cls=JSONEncode)
-            return json.loads(data)
+        if not isinstance(self.iterable, QuerySet):
+            return None
+        if hasattr(self.iterable, "summary_aggregates"):
+            return json_safe(self.get_totals("summary")["summary"])
+        if hasattr(self.iterable, "summary"):
+            return json_safe(self.iterable.summary())
         return None
 
     def resolve_records(self, info, **kwargs):
         if isinstance(self.iterable, QuerySet):
             # TODO: each models may have it own countable criteria
-            return self.iterable.order_by("id").distinct().count()
+            return self.get_totals("records")["records"]
 
         return self.length
+
+    def get_totals(self, name):
+        """{"records": int, "summary": dict}: what is selected (or `name`) in one query"""
+        totals = getattr(self, "_totals", None)
+        if totals is not None and name in totals:
+            return totals
+
+        wanted = {name}
+        if self.selected_fields is not None and not totals:
+            wanted |= {"records", "summary"} & set(self.selected_fields)
+        if not hasattr(self.iterable, "summary_aggregates"):
+            wanted.discard("summary")
+
+        expressions = {}
+        if "records" in wanted:
+            expressions["records"] = Count("id", distinct=True)
+        if "summary" in wanted:
+            summary = self.iterable.summary_aggregates()
+            expressions.update({f"summary_{key}": value for key, value in summary.items()})
+
+        values = self.iterable.order_by().aggregate(**expressions)
+        totals = dict(totals or {})
+        if "records" in wanted:
+            totals["records"] = values["records"]
+        if "summary" in wanted:
+            totals["summary"] = {key: values[f"summary_{key}"] for key in summary}
+        self._totals = totals
+        return totals
@@ -1,3 +1,6 @@
+from functools import cache
+
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.template import loader
 
@@ -6,6 +9,18 @@ from apibase.utils import query, to_gql_relay_id
 from .utils import strip_relay
 
 
+def get_template_source(template):
+    """source of a .graphql template, read once unless DEBUG (see `cached_template_source.cache_info()`)"""
+    if settings.DEBUG:
+        return loader.get_template(template).template.source
+    return cached_template_source(template)
+
+
+@cache
+def cached_template_source(template):
+    return loader.get_template(template).template.source
+
+
 def query_model_file(model_or_instance, name=None, object_name=None, id=None, **params):
     """
     Use .graphql files under django standard templates directories
@@ -25,7 +40,7 @@ def query_model_file(model_or_instance, name=None, object_name=None, id=None, **
         name = name or "query_set"
 
     template = f"{opt.app_label}/{opt.model_name}/{name}.graphql"
-    return loader.get_template(template).template.source
+    return get_template_source(template)
 
 
 def query_model(model_or_instance, name=None, object_name=None, id=None, strip=True, **params):
@@ -0,0 +1,95 @@
+"""
+persisted queries (`extensions.persistedQuery.sha256Hash` of Apollo clients)
+
+- registered queries come from the manifest (`manage.py graphql_persisted_queries`)
+- other queries are kept in the cache the first time they are sent with their hash,
+  unless PERSISTED_QUERY_ALLOWLIST only accepts the manifest
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.utils import get_app_template_dirs
+from graphql.error import GraphQLError
+
+from ..settings import apibase_settings
+
+CACHE_KEY = "apibase:persisted_query:{}"
+
+_manifest = {"path": None, "mtime": None, "queries": {}}
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code, invalid=True):
+        super().__init__(message, extensions={"code": code})
+        # False: 200 response, clients retry with the query
+        self.invalid = invalid
+
+
+def sha256(source):
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def get_manifest():
+    """{sha256: query} of the manifest, reloaded when the file changes"""
+    path = apibase_settings.PERSISTED_QUERY_MANIFEST
+    if not path or not Path(path).exists():
+        return {}
+    mtime = Path(path).stat().st_mtime
+    if (_manifest["path"], _manifest["mtime"]) != (path, mtime):
+        _manifest.update(path=path, mtime=mtime, queries=json.loads(Path(path).read_text()))
+    return _manifest["queries"]
+
+
+def get_cache():
+    return caches[apibase_settings.PERSISTED_QUERY_CACHE]
+
+
+def lookup(query_hash):
+    query = get_manifest().get(query_hash)
+    if query is None and not apibase_settings.PERSISTED_QUERY_ALLOWLIST:
+        query = get_cache().get(CACHE_KEY.format(query_hash))
+    return query
+
+
+def resolve(query, extensions):
+    """query string of a request, raises PersistedQueryError"""
+    persisted = (extensions or {}).get("persistedQuery") or {}
+    query_hash = persisted.get("sha256Hash")
+    allowlist = apibase_settings.PERSISTED_QUERY_ALLOWLIST
+
+    if not query_hash:
+        if query and allowlist and sha256(query) not in get_manifest():
+            raise PersistedQueryError("PersistedQueryNotAllowed", "PERSISTED_QUERY_NOT_ALLOWED")
+        return query
+
+    if not query:
+        query = lookup(query_hash)
+        if query is None:
+            raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND", invalid=False)
+        return query
+
+    if sha256(query) != query_hash:
+        raise PersistedQueryError("provided sha does not match query", "INVALID_PERSISTED_QUERY_HASH")
+    if query_hash not in get_manifest():
+        if allowlist:
+            raise PersistedQueryError("PersistedQueryNotAllowed", "PERSISTED_QUERY_NOT_ALLOWED")
+        get_cache().set(CACHE_KEY.format(query_hash), query, apibase_settings.PERSISTED_QUERY_TIMEOUT)
+    return query
+
+
+def get_template_dirs():
+    dirs = [Path(i) for conf in settings.TEMPLATES for i in conf.get("DIRS", [])]
+    return dirs + [Path(i) for i in get_app_template_dirs("templates")]
+
+
+def find_documents():
+    """{template name: source} of the .graphql templates (see `graphql.models.query_model_file`)"""
+    documents = {}
+    for root in get_template_dirs():
+        for path in sorted(root.rglob("*.graphql")):
+            documents.setdefault(path.relative_to(root).as_posix(), path.read_text())
+    return documents
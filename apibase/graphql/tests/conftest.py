@@ -1,6 +1,7 @@
 """Pytest configuration for graphql tests."""
 
 import django
+import pytest
 from django.conf import settings
 
 
@@ -9,6 +10,7 @@ def pytest_configure():
     if not settings.configured:
         settings.configure(
             DEBUG=True,
+            ALLOWED_HOSTS=["testserver"],
             DATABASES={
                 "default": {
                     "ENGINE": "django.db.backends.sqlite3",
@@ -18,7 +20,42 @@ def pytest_configure():
             INSTALLED_APPS=[
                 "django.contrib.contenttypes",
                 "django.contrib.auth",
+                "apibase",
+                "apibase.graphql.tests",
             ],
             DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
         )
         django.setup()
+
+
+@pytest.fixture
+def create_tables():
+    """create(*models): tables created for the test and dropped after it"""
+    from django.db import connection
+
+    created = []
+
+    def create(*models):
+        with connection.schema_editor() as editor:
+            for model in models:
+                editor.create_model(model)
+                created.append(model)
+
+    yield create
+
+    with connection.schema_editor() as editor:
+        for model in reversed(created):
+            editor.delete_model(model)
+
+
+@pytest.fixture
+def auth_tables(create_tables):
+    """tables of contenttypes and auth (User, Group, Permission) with an empty cache"""
+    from django.contrib.auth.models import Group, Permission, User
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.cache import cache
+
+    create_tables(ContentType, Permission, Group, User)
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,46 @@
+"""
+Models of the tests (tables are created by the `create_tables` fixture).
+"""
+
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=100)
+
+
+class Parent(models.Model):
+    name = models.CharField(max_length=100)
+    rank = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    tags = models.ManyToManyField(Tag, blank=True)
+    notes = GenericRelation("Note")
+
+
+class Child(models.Model):
+    parent = models.ForeignKey(Parent, on_delete=models.CASCADE)
+    name = models.CharField(max_length=100)
+
+
+class Profile(models.Model):
+    parent = models.OneToOneField(Parent, on_delete=models.CASCADE)
+    bio = models.CharField(max_length=100)
+
+
+class Note(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey()
+    text = models.CharField(max_length=100)
+
+
+class UpperParent(models.Model):
+    """overrides `save()`"""
+
+    name = models.CharField(max_length=100)
+
+    def save(self, *args, **kwargs):
+        self.name = self.name.upper()
+        super().save(*args, **kwargs)
@@ -0,0 +1,60 @@
+"""
+Tests for apibase.archives.Zipball.
+"""
+
+import os
+import zipfile
+from io import BytesIO
+
+
+def entries(data):
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        return {i.filename: (zf.read(i), i.create_system) for i in zf.infolist()}
+
+
+class TestZipball:
+    def test_append_and_read(self):
+        from apibase.archives import Zipball
+
+        zipball = Zipball().append("a.txt", "alpha").append("b.bin", b"\x00\x01")
+        assert entries(zipball.read()) == {"a.txt": (b"alpha", 0), "b.bin": (b"\x00\x01", 0)}
+
+        # appending after read() keeps the previous entries
+        zipball.append("c.txt", "gamma")
+        assert list(entries(zipball.read())) == ["a.txt", "b.bin", "c.txt"]
+
+    def test_spooled_to_disk(self):
+        from apibase.archives import Zipball
+
+        zipball = Zipball(spool_size=1024)
+        zipball.append_stream("big.bin", (os.urandom(4096) for _ in range(64)))
+        zipball.append_stream("file.txt", BytesIO(b"x" * 10000))
+        assert zipball.in_memory_zip._rolled
+
+        out = BytesIO()
+        zipball.write_to(out)
+        zipball.in_memory_zip.close()
+        result = entries(out.getvalue())
+        assert len(result["big.bin"][0]) == 64 * 4096 and result["file.txt"][0] == b"x" * 10000
+
+    def test_iterate_yields_while_writing(self):
+        from apibase.archives import Zipball
+
+        written = []
+
+        def contents():
+            for i in range(3):
+                written.append(i)
+                yield f"line {i}\n"
+
+        chunks = []
+        for chunk in Zipball.iterate([("lines.txt", contents()), ("b.txt", b"beta")]):
+            chunks.append((chunk, len(written)))
+
+        # the first bytes are sent before the generator is exhausted
+        assert chunks[0][1] < 3
+        assert entries(b"".join(i for i, _ in chunks)) == {
+            "lines.txt": (b"line 0\nline 1\nline 2\n", 0),
+            "b.txt": (b"beta", 0),
+        }
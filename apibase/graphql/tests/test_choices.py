@@ -0,0 +1,73 @@
+"""
+Tests for the cached choices of apibase.filters.AllValuesMultipleFilter.
+"""
+
+import pytest
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def groups(auth_tables, monkeypatch):
+    from django.apps import apps
+    from django.contrib.auth.models import Group
+    from django.db.models import signals
+
+    from apibase import filters
+    from apibase.settings import apibase_settings
+
+    monkeypatch.setattr(filters, "choices_models", set())
+    monkeypatch.setattr(apibase_settings, "FILTER_CHOICES_MODELS", ["auth.Group"])
+    apps.get_app_config("apibase").ready()
+    for name in ("sales", "admin", "staff"):
+        Group.objects.create(name=name)
+    yield Group
+    signals.post_save.disconnect(sender=Group, dispatch_uid="apibase_choices_auth.Group")
+    signals.post_delete.disconnect(sender=Group, dispatch_uid="apibase_choices_auth.Group")
+
+
+def get_choices(model, **kwargs):
+    from apibase.filters import AllValuesMultipleFilter
+
+    filter_field = AllValuesMultipleFilter(field_name="name", **kwargs)
+    filter_field.model = model
+    return [value for value, _ in filter_field.field.choices]
+
+
+class TestAllValuesMultipleFilter:
+    def test_choices_are_cached(self, groups):
+        from django.db import connection
+
+        assert get_choices(groups) == ["admin", "sales", "staff"]
+        with CaptureQueriesContext(connection) as queries:
+            assert get_choices(groups) == ["admin", "sales", "staff"]
+        assert len(queries) == 0
+
+    def test_save_and_delete_expire_choices(self, groups):
+        get_choices(groups)
+        groups.objects.create(name="board")
+        assert get_choices(groups) == ["admin", "board", "sales", "staff"]
+
+        groups.objects.get(name="admin").delete()
+        assert get_choices(groups) == ["board", "sales", "staff"]
+
+    def test_max_choices_and_no_cache(self, groups):
+        from django.db import connection
+
+        assert get_choices(groups, max_choices=2) == ["admin", "sales"]
+        with CaptureQueriesContext(connection) as queries:
+            get_choices(groups, choices_timeout=0)
+            get_choices(groups, choices_timeout=0)
+        assert len(queries) == 2
+
+    def test_other_models_are_not_cached(self, groups):
+        from django.contrib.auth.models import Permission
+        from django.db import connection
+        from django.db.models import signals
+
+        from apibase.filters import bump_choices_version
+
+        with CaptureQueriesContext(connection) as queries:
+            get_choices(Permission)
+            get_choices(Permission)
+        assert len(queries) == 2
+        assert bump_choices_version not in signals.post_save._live_receivers(Permission)
@@ -0,0 +1,58 @@
+"""
+Tests for static query cost analysis (apibase.graphql.cost).
+"""
+
+import graphene
+from graphql import parse
+
+
+class Item(graphene.ObjectType):
+    name = graphene.String()
+    children = graphene.relay.ConnectionField(lambda: ItemConnection)
+
+
+class ItemConnection(graphene.relay.Connection):
+    cost_weight = 3
+
+    class Meta:
+        node = Item
+
+
+class Query(graphene.ObjectType):
+    items = graphene.relay.ConnectionField(ItemConnection)
+
+
+schema = graphene.Schema(query=Query)
+
+
+def analyze(source, variables=None):
+    from apibase.graphql.cost import analyze
+
+    return analyze(schema, parse(source), variables=variables)
+
+
+class TestAnalyze:
+    def test_nested_connections_multiply(self):
+        cost = analyze("{ items(first: 10) { edges { node { children(first: 5) { edges { node { name } } } } } } }")
+
+        # items: 3, children: 3 for each of the 10 items
+        assert (cost.cost, cost.depth) == (33, 2)
+
+    def test_variables_and_fragments(self):
+        cost = analyze(
+            "query ($n: Int) { items(first: $n) { ...F } } fragment F on ItemConnection { edges { node { name } } }",
+            variables={"n": 4},
+        )
+
+        assert (cost.cost, cost.depth) == (3, 1)
+
+    def test_skipped_fields_are_free(self):
+        cost = analyze("{ items(first: 2) @skip(if: true) { edges { node { name } } } }")
+
+        assert (cost.cost, cost.depth) == (0, 0)
+
+    def test_limits(self):
+        cost = analyze("{ items(first: 10) { edges { node { children(first: 5) { pageInfo { hasNextPage } } } } } }")
+
+        assert cost.get_errors(max_cost=100, max_depth=2) == []
+        assert len(cost.get_errors(max_cost=10, max_depth=1)) == 2
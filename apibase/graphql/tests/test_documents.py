@@ -0,0 +1,48 @@
+"""
+Tests for the parsed/validated document cache (apibase.graphql.documents).
+"""
+
+import graphene
+import pytest
+
+
+class Query(graphene.ObjectType):
+    hello = graphene.String()
+
+    def resolve_hello(self, info):
+        return "world"
+
+
+schema = graphene.Schema(query=Query)
+
+
+class TestDocumentCache:
+    def test_documents_are_parsed_once(self):
+        from apibase.graphql.documents import DocumentCache
+
+        cache = DocumentCache(maxsize=2)
+        first = cache.get(schema, "{ hello }")
+
+        assert cache.get(schema, "{ hello }") is first
+        assert cache.info() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+    def test_least_recently_used_is_evicted(self):
+        from apibase.graphql.documents import DocumentCache
+
+        cache = DocumentCache(maxsize=2)
+        for source in ("{ hello }", "{ a: hello }", "{ hello }", "{ b: hello }"):
+            cache.get(schema, source)
+
+        assert cache.info()["size"] == 2
+        cache.get(schema, "{ hello }")
+        assert cache.info()["hits"] == 2
+
+    def test_invalid_documents_are_not_cached(self):
+        from graphql.error import GraphQLError
+
+        from apibase.graphql.documents import DocumentCache
+
+        cache = DocumentCache(maxsize=2)
+        with pytest.raises(GraphQLError):
+            cache.get(schema, "{ nope }")
+        assert cache.info()["size"] == 0
@@ -0,0 +1,22 @@
+"""
+Tests for json_safe() in apibase.graphql.encoders.
+"""
+
+import datetime
+import decimal
+import json
+import uuid
+
+
+def test_json_safe_matches_round_trip():
+    from apibase.graphql.encoders import JSONEncode, json_safe
+
+    value = {
+        "total": decimal.Decimal("1.50"),
+        "at": datetime.datetime(2024, 1, 2, 3, 4, 5),
+        "day": datetime.date(2024, 1, 2),
+        "id": uuid.UUID(int=1),
+        1: [None, True, ("a", 2)],
+    }
+
+    assert json_safe(value) == json.loads(json.dumps(value, cls=JSONEncode))
@@ -0,0 +1,232 @@
+"""
+Tests for sparse fieldsets (apibase.fieldsets).
+"""
+
+import pytest
+
+
+@pytest.fixture
+def serializer_class():
+    from rest_framework import serializers
+
+    from . import models
+
+    class TagSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = models.Tag
+            fields = ["id", "name"]
+
+    class ParentSerializer(serializers.ModelSerializer):
+        tags = TagSerializer(many=True)
+
+        class Meta:
+            model = models.Parent
+            fields = ["id", "name", "rank", "tags"]
+
+    class ChildSerializer(serializers.ModelSerializer):
+        parent = ParentSerializer()
+
+        class Meta:
+            model = models.Child
+            fields = ["id", "name", "parent"]
+
+    return ChildSerializer
+
+
+def field_names(serializer):
+    from apibase.fieldsets import field_tree
+
+    return field_tree(serializer)
+
+
+class TestToTree:
+    def test_paths(self):
+        from apibase.fieldsets import parse, to_tree
+
+        assert to_tree(parse("name, parent.tags.name,parent.name")) == {
+            "name": None,
+            "parent": {"name": None, "tags": {"name": None}},
+        }
+
+    def test_whole_field_wins(self):
+        from apibase.fieldsets import to_tree
+
+        assert to_tree(["parent", "parent.name"]) == {"parent": None}
+
+
+class TestPrune:
+    def test_include(self, serializer_class):
+        from apibase.fieldsets import prune, to_tree
+
+        serializer = prune(serializer_class(), include=to_tree(["name", "parent.tags.name"]))
+
+        assert field_names(serializer) == {"name": None, "parent": {"tags": {"name": None}}}
+
+    def test_exclude(self, serializer_class):
+        from apibase.fieldsets import prune, to_tree
+
+        serializer = prune(serializer_class(), exclude=to_tree(["id", "parent.tags", "parent.name.x", "unknown"]))
+
+        assert field_names(serializer) == {"name": None, "parent": {"id": None, "name": None, "rank": None}}
+
+    def test_list_serializer(self, serializer_class):
+        from apibase.fieldsets import prune, to_tree
+
+        serializer = prune(serializer_class(many=True), include=to_tree(["id"]))
+
+        assert field_names(serializer) == {"id": None}
+
+
+class TestOnlyFields:
+    def test_columns_of_joined_rows(self, serializer_class):
+        from apibase.fieldsets import only_fields, prune, to_tree
+
+        from . import models
+
+        serializer = prune(serializer_class(), include=to_tree(["name", "parent.rank"]))
+
+        assert only_fields(serializer, models.Child) == ["id", "name", "parent", "parent__id", "parent__rank"]
+
+    def test_to_many_relations_are_prefetched(self, serializer_class):
+        from apibase.fieldsets import only_fields, prune, to_tree
+
+        from . import models
+
+        serializer = prune(serializer_class(), include=to_tree(["parent.tags"]))
+
+        assert only_fields(serializer, models.Child) == ["id", "parent", "parent__id"]
+
+    def test_unknown_columns(self, serializer_class):
+        from rest_framework import serializers
+
+        from apibase.fieldsets import only_fields
+
+        from . import models
+
+        serializer = serializer_class()
+        serializer.fields["upper"] = serializers.SerializerMethodField()
+
+        assert only_fields(serializer, models.Child) is None
+
+
+class TestKnownPaths:
+    def test_unknown_paths_are_dropped(self, serializer_class):
+        from apibase.fieldsets import field_tree, known_paths
+
+        tree = field_tree(serializer_class())
+
+        assert known_paths(tree, ["name", "x", "parent.x", "parent.tags.name"]) == ("name", "parent.tags.name")
+
+    def test_below_a_plain_field(self, serializer_class):
+        from apibase.fieldsets import field_tree, known_paths
+
+        tree = field_tree(serializer_class())
+
+        assert known_paths(tree, ["name.x"]) == ("name",)
+        assert known_paths(tree, ["name.x"], exclude=True) == ()
+
+
+class TestPlanView:
+    def create_view(self, view_class, query):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        request = Request(APIRequestFactory().get("/", query))
+        return view_class(request=request, format_kwarg=None, action="list", kwargs={})
+
+    @pytest.fixture
+    def view_class(self, serializer_class):
+        from apibase.viewsets import BaseModelViewSet
+
+        return type(
+            "ChildViewSet",
+            (BaseModelViewSet,),
+            {"serializer_class": serializer_class, "fields_query": "fields", "exclude_query": "exclude"},
+        )
+
+    def test_plan(self, view_class):
+        plan = self.create_view(view_class, {"fields": "name,parent.rank"}).get_queryset_plan()
+
+        assert plan.select_related == ("parent",)
+        assert plan.prefetch_related == ()
+        assert plan.only == ["id", "name", "parent", "parent__id", "parent__rank"]
+
+    def test_plans_are_keyed_by_field_names(self, view_class):
+        from apibase import planners
+
+        plans = [
+            self.create_view(view_class, {"fields": fields}).get_queryset_plan()
+            for fields in ("name,parent.rank", "parent.rank,name,unknown", "name, parent.rank.x,parent.y")
+        ]
+
+        assert plans[0] is plans[1] is plans[2]
+        assert len([i for i in planners.view_plans.plans if i[0] is view_class]) == 1
+
+    def test_unknown_fields_only(self, view_class):
+        view = self.create_view(view_class, {"fields": "unknown"})
+
+        assert view.get_fieldset() == ((), ())
+        assert field_names(view.get_serializer()) == {}
+
+    def test_plan_cache_is_bounded(self, view_class, monkeypatch):
+        from apibase import planners
+
+        monkeypatch.setattr(planners, "view_plans", planners.PlanCache(maxsize=2))
+        for fields in ("id", "name", "parent", "name"):
+            self.create_view(view_class, {"fields": fields}).get_queryset_plan()
+
+        assert [i[2] for i in planners.view_plans.plans] == [("parent",), ("name",)]
+
+
+class TestJoinedColumns:
+    @pytest.fixture
+    def children(self, create_tables):
+        from . import models
+
+        create_tables(models.Tag, models.Parent, models.Child)
+        for i in range(2):
+            models.Child.objects.create(parent=models.Parent.objects.create(name=f"p{i}"), name=f"c{i}")
+        return models.Child
+
+    def test_joins_of_the_view_queryset(self, children, serializer_class):
+        from rest_framework.test import APIRequestFactory
+
+        from apibase.viewsets import BaseModelViewSet
+
+        view_class = type(
+            "JoinedChildViewSet",
+            (BaseModelViewSet,),
+            {
+                "queryset": children.objects.select_related("parent").order_by("pk"),
+                "serializer_class": serializer_class,
+                "fields_query": "fields",
+            },
+        )
+
+        response = view_class.as_view({"get": "list"})(APIRequestFactory().get("/", {"fields": "name"}))
+
+        assert response.status_code == 200
+        assert [i["name"] for i in response.data["results"]] == ["c0", "c1"]
+
+    def test_declared_joins(self, children, serializer_class):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from apibase.fieldsets import plan_fieldset, prune, to_tree
+
+        serializer_class.Meta.select_related = ["parent"]
+        plan = plan_fieldset(prune(serializer_class(many=True), include=to_tree(["name"])), children)
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(plan.apply(children.objects.order_by("pk")))
+            assert [str(i.parent.name) for i in rows] == ["p0", "p1"]
+        assert len(queries) == 1
+
+    def test_reverse_one_to_one_drops_only(self, children):
+        from apibase.planners import with_joined_columns
+
+        from . import models
+
+        assert with_joined_columns(children.objects.select_related("parent"), ["id"]) == ["id", "parent"]
+        assert with_joined_columns(models.Parent.objects.select_related("profile"), ["id"]) is None
+        assert with_joined_columns(children.objects.select_related(), ["id"]) is None
@@ -0,0 +1,41 @@
+"""
+Tests for the shared filtering args of apibase.utils.get_filtering_args_from_filterset.
+"""
+
+from unittest.mock import patch
+
+
+def create_filterset():
+    import django_filters
+    from django.contrib.contenttypes.models import ContentType
+
+    class ContentTypeFilter(django_filters.FilterSet):
+        class Meta:
+            model = ContentType
+            fields = {"app_label": ["exact", "icontains"], "id": ["exact"]}
+
+    return ContentTypeFilter
+
+
+class TestFilteringArgs:
+    def test_args_are_built_once(self):
+        from apibase import utils
+
+        filterset_class = create_filterset()
+        with patch.object(utils, "build_filtering_args", wraps=utils.build_filtering_args) as build:
+            first = utils.get_filtering_args_from_filterset(filterset_class, None)
+            second = utils.get_filtering_args_from_filterset(filterset_class, None)
+
+        assert build.call_count == 1
+        assert set(first) == {"app_label", "app_label__icontains", "id"}
+        assert first == second and first is not second
+
+    def test_obvious_filters_are_part_of_the_key(self):
+        from apibase import filters, utils
+
+        filterset_class = create_filterset()
+        with patch.object(utils, "build_filtering_args", wraps=utils.build_filtering_args) as build:
+            utils.get_filtering_args_from_filterset(filterset_class, None)
+            utils.get_filtering_args_from_filterset(filterset_class, None, obvious_filters=[filters.IntFilter])
+
+        assert build.call_count == 2
@@ -0,0 +1,288 @@
+"""
+Tests for per-request DataLoaders (apibase.graphql.loaders).
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+
+def create_node_type(rows):
+    """Create a node type whose get_queryset returns `rows` for any pk__in."""
+    queryset = MagicMock()
+    queryset.filter.side_effect = lambda pk__in: [row for row in rows if row.pk in pk__in]
+
+    model = MagicMock()
+    model._meta.pk.to_python.side_effect = int
+    model._default_manager.all.return_value = queryset
+
+    node_type = MagicMock()
+    node_type._meta.model = model
+    node_type.get_queryset.side_effect = lambda queryset, info: queryset
+    return node_type, queryset
+
+
+class TestModelLoader:
+    def test_keys_in_one_tick_are_fetched_once(self):
+        from promise import Promise
+
+        from apibase.graphql.loaders import get_loader
+
+        rows = [SimpleNamespace(pk=i) for i in (1, 2, 3)]
+        node_type, queryset = create_node_type(rows)
+        info = SimpleNamespace(context=SimpleNamespace())
+
+        loader = get_loader(info, node_type)
+        # loads inside a promise chain are queued like during query execution
+        result = Promise.resolve(None).then(lambda _: Promise.all([loader.load(i) for i in ("1", 3, 9)])).get()
+
+        assert [getattr(i, "pk", None) for i in result] == [1, 3, None]
+        assert queryset.filter.call_count == 1
+        node_type.get_queryset.assert_called_once()
+
+    def test_loader_is_kept_on_context(self):
+        from apibase.graphql.loaders import get_loader
+
+        node_type, _ = create_node_type([])
+        info = SimpleNamespace(context=SimpleNamespace())
+
+        assert get_loader(info, node_type) is get_loader(info, node_type)
+
+    def test_no_loader_without_context(self):
+        from apibase.graphql.loaders import get_loader
+
+        node_type, _ = create_node_type([])
+        assert get_loader(SimpleNamespace(context=None), node_type) is None
+
+
+class TestLoadRelated:
+    def test_non_model_root_is_not_batched(self):
+        from apibase.graphql.loaders import load_related
+
+        info = SimpleNamespace(context=SimpleNamespace())
+        assert load_related({"content_type": 1}, "content_type", info) is None
+
+
+class TestGetWindow:
+    def test_first_after(self):
+        from graphql_relay.connection.arrayconnection import offset_to_cursor
+
+        from apibase.graphql.loaders import get_window
+
+        assert get_window({"first": 5}) == (0, 5)
+        assert get_window({"first": 5, "after": offset_to_cursor(4)}) == (5, 5)
+
+    def test_offset_and_max_limit(self):
+        from graphql_relay.connection.arrayconnection import offset_to_cursor
+
+        from apibase.graphql.loaders import get_window
+
+        assert get_window({"offset": 3}, max_limit=100) == (3, 100)
+        assert get_window({"offset": 3, "after": offset_to_cursor(1), "first": 500}, max_limit=100) == (5, 100)
+
+    def test_last_is_not_batched(self):
+        from apibase.graphql.loaders import get_window
+
+        assert get_window({"last": 5}) is None
+
+
+@pytest.fixture
+def models(create_tables):
+    from django.contrib.contenttypes.models import ContentType
+
+    from . import models
+
+    create_tables(ContentType, models.Tag, models.Parent, models.Child, models.Profile, models.Note)
+    tags = [models.Tag.objects.create(name=f"t{i}") for i in range(3)]
+    for i in range(5):
+        parent = models.Parent.objects.create(name=f"p{i}", rank=i % 2)
+        parent.tags.set(tags[: i % 4])
+        for j in range(i):
+            models.Child.objects.create(parent=parent, name=f"c{(j * 7) % 5}-{j}")
+    return models
+
+
+@pytest.fixture(params=[True, False], ids=["row_number", "python"])
+def over_clause(request, monkeypatch):
+    from django.db import connection
+
+    monkeypatch.setattr(connection.features, "supports_over_clause", request.param)
+    return request.param
+
+
+def load_windows(queryset, lookup, keys, start, size):
+    from promise import Promise
+
+    from apibase.graphql.loaders import ConnectionLoader
+
+    loader = ConnectionLoader(queryset, lookup, start, size)
+    return Promise.resolve(None).then(lambda _: Promise.all([loader.load(key) for key in keys])).get()
+
+
+class TestConnectionLoader:
+    @pytest.mark.parametrize("start, size", [(0, 2), (1, 2), (0, None), (2, 5), (10, 2)])
+    def test_reverse_foreign_key(self, models, over_clause, start, size):
+        queryset = models.Child.objects.order_by("-name")
+        parents = list(models.Parent.objects.order_by("pk"))
+        end = None if size is None else start + size
+
+        windows = load_windows(queryset, "parent", [i.pk for i in parents], start, size)
+
+        for parent, window in zip(parents, windows):
+            rows = queryset.filter(parent=parent)
+            assert [i.pk for i in window.rows] == [i.pk for i in rows[start:end]]
+            assert len(window) == rows.count()
+            assert list(window.queryset) == list(rows)
+
+    @pytest.mark.parametrize("start, size", [(0, 1), (1, 3)])
+    def test_many_to_many(self, models, over_clause, start, size):
+        # a row of several parents is in the page of each of them
+        queryset = models.Parent.objects.order_by("rank", "-name")
+        tags = list(models.Tag.objects.order_by("pk"))
+
+        windows = load_windows(queryset, "tags", [i.pk for i in tags], start, size)
+
+        for tag, window in zip(tags, windows):
+            rows = queryset.filter(tags=tag)
+            assert [i.pk for i in window.rows] == [i.pk for i in rows[start : start + size]]
+            assert len(window) == rows.count()
+
+    def test_default_ordering_and_unknown_keys(self, models, over_clause):
+        queryset = models.Child.objects.all()
+        parent = models.Parent.objects.get(name="p4")
+
+        windows = load_windows(queryset, "parent", [parent.pk, 0], 0, 3)
+
+        assert [i.pk for i in windows[0].rows] == [i.pk for i in queryset.filter(parent=parent).order_by("pk")[:3]]
+        assert (windows[1].rows, len(windows[1])) == ([], 0)
+
+    def test_one_query_for_all_parents(self, models):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        parents = list(models.Parent.objects.all())
+        with CaptureQueriesContext(connection) as queries:
+            load_windows(models.Child.objects.order_by("name"), "parent", [i.pk for i in parents], 0, 2)
+
+        # counts, ranked pks and rows
+        assert len(queries) == 3
+
+
+@pytest.fixture(scope="module")
+def connection_type():
+    from graphene import relay
+    from graphene_django import DjangoObjectType
+
+    from . import models
+
+    class LoaderChildNode(DjangoObjectType):
+        class Meta:
+            model = models.Child
+            interfaces = (relay.Node,)
+            fields = ("id", "name")
+
+    class LoaderChildConnection(relay.Connection):
+        class Meta:
+            node = LoaderChildNode
+
+    return LoaderChildConnection
+
+
+class TestResolveConnection:
+    def resolve(self, connection_type, args, iterable):
+        from apibase.graphql.fields import NodeSet
+
+        connection = NodeSet.resolve_connection(connection_type, dict(args), iterable)
+        return (
+            [(edge.cursor, edge.node.pk) for edge in connection.edges],
+            connection.page_info.has_previous_page,
+            connection.page_info.has_next_page,
+            connection.length,
+        )
+
+    @pytest.mark.parametrize(
+        "args",
+        [{"first": 2}, {"first": 2, "after": 1}, {"first": 10}, {"offset": 1, "first": 2}, {"first": 2, "after": 7}],
+    )
+    def test_window_equals_queryset(self, models, over_clause, connection_type, args):
+        from graphql_relay.connection.arrayconnection import offset_to_cursor
+
+        from apibase.graphql.loaders import get_window
+
+        if "after" in args:
+            args = {**args, "after": offset_to_cursor(args["after"])}
+        queryset = models.Child.objects.order_by("name")
+        parents = list(models.Parent.objects.order_by("pk"))
+
+        windows = load_windows(queryset, "parent", [i.pk for i in parents], *get_window(args))
+
+        for parent, window in zip(parents, windows):
+            expected = self.resolve(connection_type, args, queryset.filter(parent=parent))
+            assert self.resolve(connection_type, args, window) == expected
+
+
+@pytest.fixture(scope="module")
+def schema():
+    import graphene
+    from graphene import relay
+    from graphene_django import DjangoObjectType
+
+    from apibase.graphql.fields import NodeSet
+
+    from . import models
+
+    class SchemaChildNode(DjangoObjectType):
+        class Meta:
+            model = models.Child
+            interfaces = (relay.Node,)
+            fields = ("id", "name")
+            filter_fields = ["name"]
+
+    class SchemaParentNode(DjangoObjectType):
+        child_set = NodeSet(SchemaChildNode, batched=True)
+
+        class Meta:
+            model = models.Parent
+            interfaces = (relay.Node,)
+            fields = ("id", "name", "child_set")
+            filter_fields = ["name"]
+
+    class Query(graphene.ObjectType):
+        parents = NodeSet(SchemaParentNode)
+
+    return graphene.Schema(query=Query)
+
+
+class TestBatchedNodeSet:
+    def execute(self, schema, source):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(source, context_value=SimpleNamespace())
+        assert not result.errors
+        return result.data, [i["sql"] for i in queries]
+
+    def test_pages_are_loaded_per_parent(self, models, schema, monkeypatch):
+        from django.db import connection
+
+        monkeypatch.setattr(connection.features, "supports_over_clause", True)
+        data, queries = self.execute(
+            schema, "{ parents { edges { node { name childSet(first: 1) { edges { node { name } } } } } } }"
+        )
+
+        children = {
+            edge["node"]["name"]: [i["node"]["name"] for i in edge["node"]["childSet"]["edges"]]
+            for edge in data["parents"]["edges"]
+        }
+        expected = {
+            parent.name: [i.name for i in parent.child_set.order_by("pk")[:1]]
+            for parent in models.Parent.objects.all()
+        }
+        assert children == expected
+        # the first child of every parent, not all children prefetched by the lookahead of `parents`
+        assert len([i for i in queries if "ROW_NUMBER" in i]) == 1
+        assert not [
+            i for i in queries if '"tests_child"."parent_id" IN' in i and "COUNT" not in i and "ROW_NUMBER" not in i
+        ]
@@ -0,0 +1,61 @@
+"""
+Tests for selection-set collection in apibase.graphql.lookahead.
+"""
+
+from types import SimpleNamespace
+
+from graphql import parse
+from graphql.language import ast
+
+
+def create_info(source, variables=None):
+    """Create a ResolveInfo-like object for the first field of the operation."""
+    document = parse(source)
+    operation = next(i for i in document.definitions if isinstance(i, ast.OperationDefinition))
+    fragments = {i.name.value: i for i in document.definitions if isinstance(i, ast.FragmentDefinition)}
+    return SimpleNamespace(
+        field_asts=[operation.selection_set.selections[0]],
+        fragments=fragments,
+        variable_values=variables or {},
+    )
+
+
+def as_dict(selection):
+    return {name: as_dict(child) for name, child in selection.fields.items()}
+
+
+class TestCollect:
+    def test_fragments_are_merged(self):
+        from apibase.graphql.lookahead import collect
+
+        info = create_info(
+            """
+            query { items { edges { node { name ...F ... on Item { code } } } } }
+            fragment F on Item { owner { name } }
+            """
+        )
+        selection = collect(info, info.field_asts, {"cacheable": True})
+
+        node = as_dict(selection)["edges"]["node"]
+        assert node == {"name": {}, "owner": {"name": {}}, "code": {}}
+
+    def test_arguments_are_recorded(self):
+        from apibase.graphql.lookahead import collect
+
+        info = create_info('query { items { children(first: 2, code: "a") { totalCount } } }')
+        selection = collect(info, info.field_asts, {"cacheable": True})
+
+        assert selection.fields["children"].args == {"first", "code"}
+
+    def test_variable_directives_are_not_cacheable(self):
+        from apibase.graphql.lookahead import collect
+
+        info = create_info(
+            "query ($full: Boolean) { items { name owner @include(if: $full) { name } code @skip(if: true) } }",
+            variables={"full": False},
+        )
+        state = {"cacheable": True}
+        selection = collect(info, info.field_asts, state)
+
+        assert as_dict(selection) == {"name": {}}
+        assert state["cacheable"] is False
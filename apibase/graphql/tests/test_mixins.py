@@ -0,0 +1,155 @@
+"""
+Tests for the totals of connections (apibase.graphql.mixins.SummaryMixin).
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from django.db.models import QuerySet, Sum
+
+
+class SummaryQuerySet(QuerySet):
+    def summary_aggregates(self):
+        return {"rank": Sum("rank")}
+
+
+class SummaryMethodQuerySet(QuerySet):
+    def summary(self):
+        return {"names": sorted(self.values_list("name", flat=True))}
+
+
+@pytest.fixture
+def models(create_tables):
+    from . import models
+
+    create_tables(models.Tag, models.Parent)
+    for i in range(5):
+        models.Parent.objects.create(name=f"p{i}", rank=i)
+    return models
+
+
+def count_queries(func):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        result = func()
+    return result, [i["sql"] for i in queries]
+
+
+def create_connection(iterable, selected_fields=None):
+    from apibase.graphql.mixins import SummaryMixin
+
+    connection = SummaryMixin()
+    connection.iterable = iterable
+    connection.length = len(iterable)
+    connection.selected_fields = selected_fields
+    return connection
+
+
+class TestTotals:
+    def test_records_alone(self, models):
+        connection = create_connection(models.Parent.objects.filter(rank__gte=2))
+
+        result, queries = count_queries(lambda: (connection.resolve_records(None), connection.resolve_records(None)))
+
+        assert result == (3, 3)
+        assert len(queries) == 1
+
+    def test_summary_aggregates_with_records(self, models):
+        queryset = SummaryQuerySet(models.Parent).filter(rank__gte=2)
+        connection = create_connection(queryset, selected_fields={"records", "summary", "edges"})
+
+        result, queries = count_queries(lambda: (connection.resolve_summary(None), connection.resolve_records(None)))
+
+        assert result == ({"rank": 9}, 3)
+        assert len(queries) == 1 and "COUNT" in queries[0] and "SUM" in queries[0]
+
+    def test_unselected_totals_are_not_computed(self, models):
+        connection = create_connection(SummaryQuerySet(models.Parent), selected_fields={"records"})
+
+        result, queries = count_queries(lambda: connection.resolve_records(None))
+
+        assert result == 5
+        assert "SUM" not in queries[0]
+        # asked for anyway: computed then
+        assert connection.resolve_summary(None) == {"rank": 10}
+
+    def test_summary_method(self, models):
+        connection = create_connection(
+            SummaryMethodQuerySet(models.Parent).filter(rank__lt=2), selected_fields={"records", "summary"}
+        )
+
+        assert connection.resolve_summary(None) == {"names": ["p0", "p1"]}
+        assert connection.resolve_records(None) == 2
+
+    def test_not_a_queryset(self):
+        connection = create_connection([1, 2])
+
+        assert connection.resolve_records(None) == 2
+        assert connection.resolve_summary(None) is None
+
+
+@pytest.fixture(scope="module")
+def schema():
+    import graphene
+    from graphene import relay
+    from graphene_django import DjangoObjectType
+
+    from apibase.graphql.fields import NodeSet
+
+    from . import models
+
+    class SummaryParentNode(DjangoObjectType):
+        class Meta:
+            model = models.Parent
+            interfaces = (relay.Node,)
+            fields = ("id", "name", "rank")
+            filter_fields = ["name"]
+
+    class Query(graphene.ObjectType):
+        parents = NodeSet(SummaryParentNode)
+
+        def resolve_parents(root, info, **kwargs):
+            return SummaryQuerySet(models.Parent).order_by("pk")
+
+    return graphene.Schema(query=Query)
+
+
+class TestConnectionTotals:
+    def execute(self, schema, source):
+        result, queries = count_queries(lambda: schema.execute(source, context_value=SimpleNamespace()))
+        assert not result.errors
+        return result.data["parents"], queries
+
+    def test_records_and_summary_in_one_query(self, models, schema):
+        data, queries = self.execute(
+            schema, "{ parents(first: 2) { totalCount records summary edges { node { name } } } }"
+        )
+
+        assert data == {
+            "totalCount": 5,
+            "records": 5,
+            "summary": {"rank": 10},
+            "edges": [{"node": {"name": "p0"}}, {"node": {"name": "p1"}}],
+        }
+        totals = [i for i in queries if "SUM" in i]
+        assert len(totals) == 1 and "COUNT(DISTINCT" in totals[0]
+
+    def test_fragments(self, models, schema):
+        data, queries = self.execute(
+            schema,
+            "{ parents(first: 1) { ...Totals } }"
+            " fragment Totals on SummaryParentNodeNodeSetConnection { records summary }",
+        )
+
+        assert data == {"records": 5, "summary": {"rank": 10}}
+        assert len([i for i in queries if "SUM" in i]) == 1
+
+    def test_only_what_is_selected(self, models, schema):
+        _, records = self.execute(schema, "{ parents(first: 2) { records edges { node { name } } } }")
+        _, edges = self.execute(schema, "{ parents(first: 2) { edges { node { name } } } }")
+
+        assert not [i for i in records if "SUM" in i]
+        assert len([i for i in records if "COUNT(DISTINCT" in i]) == 1
+        assert not [i for i in edges if "SUM" in i or "COUNT(DISTINCT" in i]
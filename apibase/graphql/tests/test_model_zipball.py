@@ -0,0 +1,60 @@
+"""
+Tests for the chunked JSON dumps of apibase.archives.ModelZipball.
+"""
+
+import json
+import zipfile
+from io import BytesIO
+
+import pytest
+
+
+@pytest.fixture
+def querysets(auth_tables):
+    from django.contrib.auth.models import Group, Permission
+    from django.contrib.contenttypes.models import ContentType
+
+    for i in range(25):
+        content_type = ContentType.objects.create(app_label="items", model=f"item{i}")
+        Permission.objects.create(codename=f"view_item{i}", name=f"Can view 項目{i}", content_type=content_type)
+        Group.objects.create(name=f"group{i}")
+
+    return [ContentType.objects.order_by("pk"), Permission.objects.order_by("pk"), Group.objects.order_by("pk")]
+
+
+def read_entries(zipball):
+    with zipfile.ZipFile(BytesIO(zipball.read())) as zf:
+        return {name: json.loads(zf.read(name)) for name in zf.namelist()}
+
+
+class TestModelZipball:
+    def test_append_query_equals_serialize(self, querysets):
+        from django.core import serializers
+
+        from apibase.archives import ModelZipball
+
+        zipball = ModelZipball()
+        for queryset in querysets:
+            zipball.append_query(queryset, chunk_size=7)
+
+        assert read_entries(zipball) == {
+            zipball.get_file_name(i): json.loads(serializers.serialize("json", i)) for i in querysets
+        }
+
+    def test_parallel_dumps_keep_order(self, querysets, monkeypatch):
+        from apibase.archives import ModelZipball
+
+        expected = read_entries(ModelZipball().append_queries(querysets))
+
+        # worker threads of an in-memory sqlite database see another (empty) database:
+        # dump in the test thread, let the pool only run the workers
+        dumps = {id(i): ModelZipball().dump_to_file(i) for i in querysets}
+        monkeypatch.setattr(ModelZipball, "dump_to_file", lambda self, queryset, chunk_size=None: dumps[id(queryset)])
+        zipball = ModelZipball().append_queries(querysets, workers=3)
+
+        assert list(read_entries(zipball)) == [
+            "contenttypes.contenttype.json",
+            "auth.permission.json",
+            "auth.group.json",
+        ]
+        assert read_entries(zipball) == expected
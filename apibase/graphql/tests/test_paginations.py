@@ -0,0 +1,274 @@
+"""
+Tests for apibase.paginations.
+"""
+
+import base64
+import datetime
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+def get_request(url):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    return Request(APIRequestFactory().get(url))
+
+
+class TestKeysetPagination:
+    @pytest.fixture
+    def parents(self, create_tables):
+        from . import models
+
+        create_tables(models.Parent)
+        base = datetime.datetime(2024, 1, 1, 12, 0, 0, 999000)
+        for i in range(10):
+            parent = models.Parent.objects.create(name=f"p{i}", rank=i % 3)
+            # less than a millisecond apart, across a millisecond boundary
+            models.Parent.objects.filter(pk=parent.pk).update(
+                updated_at=base + datetime.timedelta(microseconds=i * 300)
+            )
+        return models.Parent.objects.all()
+
+    def paginate(self, queryset, url, ordering, page_size=3):
+        from apibase.paginations import KeysetPagination
+
+        paginator = KeysetPagination()
+        paginator.page_size = page_size
+        rows = paginator.paginate_queryset(queryset, get_request(url), view=SimpleNamespace(keyset_ordering=ordering))
+        return paginator, [i.name for i in rows]
+
+    def walk(self, queryset, ordering, link="next", url="/"):
+        pages = []
+        while url:
+            # repeated rows never reach the end
+            assert len(pages) < queryset.count()
+            paginator, names = self.paginate(queryset, url, ordering)
+            pages.append(names)
+            url = getattr(paginator, link)
+        return pages
+
+    @pytest.mark.parametrize("ordering", [["updated_at"], ["-updated_at"], ["rank", "-updated_at"]])
+    def test_every_row_once(self, parents, ordering):
+        expected = [i.name for i in parents.order_by(*ordering, "pk")]
+
+        pages = self.walk(parents, ordering)
+
+        assert [name for page in pages for name in page] == expected
+        assert [len(i) for i in pages] == [3, 3, 3, 1]
+
+    @pytest.mark.parametrize("ordering", [["updated_at"], ["rank", "-updated_at"]])
+    def test_previous_pages(self, parents, ordering):
+        forward = self.walk(parents, ordering)
+        paginator, _ = self.paginate(parents, "/", ordering)
+        last = paginator
+        while last.next:
+            last, _ = self.paginate(parents, last.next, ordering)
+
+        backward = self.walk(parents, ordering, link="previous", url=last.previous)
+
+        # pages before the last one, seen from its first row
+        rows = [name for page in forward for name in page]
+        assert [name for page in reversed(backward) for name in page] == rows[:-1]
+
+    def test_first_and_last_page(self, parents):
+        first, _ = self.paginate(parents, "/", ["updated_at"], page_size=5)
+        second, names = self.paginate(parents, first.next, ["updated_at"], page_size=5)
+        back, back_names = self.paginate(parents, second.previous, ["updated_at"], page_size=5)
+
+        assert first.previous is None
+        assert names == [f"p{i}" for i in range(5, 10)] and second.next is None
+        assert back_names == [f"p{i}" for i in range(5)] and back.previous is None
+        assert back.next is not None
+
+    def test_cursor_keeps_microseconds(self, parents):
+        paginator, _ = self.paginate(parents, "/", ["updated_at"], page_size=1)
+        cursor = paginator.next.split("cursor=")[1]
+
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+        assert data["v"][0] == "2024-01-01T12:00:00.999000"
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "not-base64!",
+            base64.urlsafe_b64encode(b"[]").decode(),
+            base64.urlsafe_b64encode(b'{"v":["x","1"],"r":0}').decode(),
+            base64.urlsafe_b64encode(b'{"v":["2024-01-01T00:00:00"],"r":0}').decode(),
+            base64.urlsafe_b64encode(b'{"r":0}').decode(),
+        ],
+    )
+    def test_bad_cursor(self, parents, cursor):
+        from rest_framework.exceptions import NotFound
+
+        with pytest.raises(NotFound):
+            self.paginate(parents, f"/?cursor={cursor}", ["updated_at"])
+
+
+class TestPageRange:
+    def page_range(self, number, limit, count=200):
+        from apibase.paginations import Pagination
+
+        pagination = Pagination()
+        pagination.page_size = 10
+        pagination.page_range_limit = limit
+        pagination.paginate_queryset(list(range(count)), get_request(f"/?page={number}"))
+        return pagination.get_page_range()
+
+    @pytest.mark.parametrize(
+        "number, expected",
+        [
+            (1, [1, 2, 3, 4, 5]),
+            (2, [1, 2, 3, 4, 5]),
+            (3, [1, 2, 3, 4, 5]),
+            (4, [2, 3, 4, 5, 6]),
+            (10, [8, 9, 10, 11, 12]),
+        ],
+    )
+    def test_window_at_the_start(self, number, expected):
+        assert self.page_range(number, 5) == expected
+
+    @pytest.mark.parametrize("number", [18, 19, 20])
+    def test_window_at_the_end(self, number):
+        assert self.page_range(number, 5) == [16, 17, 18, 19, 20]
+
+    def test_even_limit(self):
+        assert self.page_range(10, 4) == [8, 9, 10, 11]
+        assert self.page_range(20, 4) == [17, 18, 19, 20]
+
+    def test_fewer_pages_than_the_limit(self):
+        assert self.page_range(2, 5, count=30) == [1, 2, 3]
+
+    def test_all_pages(self):
+        assert self.page_range(7, None) == list(range(1, 21))
+
+
+class TestCachedCount:
+    @pytest.fixture
+    def models(self, create_tables, monkeypatch):
+        from django.apps import apps
+        from django.contrib.contenttypes.models import ContentType
+        from django.core.cache import cache
+        from django.db.models import signals
+
+        from apibase import paginations
+        from apibase.settings import apibase_settings
+
+        from . import models
+
+        create_tables(ContentType, models.Tag, models.Parent, models.Child, models.Profile, models.Note)
+        ContentType.objects.clear_cache()
+        monkeypatch.setattr(paginations, "count_tables", set())
+        monkeypatch.setattr(apibase_settings, "COUNT_CACHE_MODELS", ["tests.Tag", "tests.Parent"])
+        apps.get_app_config("apibase").ready()
+        cache.clear()
+        yield models
+        cache.clear()
+        for model in (models.Tag, models.Parent):
+            uid = f"apibase_count_{model._meta.label}"
+            signals.post_save.disconnect(sender=model, dispatch_uid=uid)
+            signals.post_delete.disconnect(sender=model, dispatch_uid=uid)
+        through = models.Parent.tags.through
+        signals.m2m_changed.disconnect(sender=through, dispatch_uid=f"apibase_count_{through._meta.label}")
+
+    def count(self, queryset):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from apibase.paginations import cached_count
+
+        with CaptureQueriesContext(connection) as queries:
+            count = cached_count(queryset)
+        return count, len(queries)
+
+    def test_cached_until_a_row_changes(self, models):
+        models.Parent.objects.create(name="a")
+        queryset = models.Parent.objects.filter(name__startswith="a")
+
+        assert self.count(queryset) == (1, 1)
+        assert self.count(queryset) == (1, 0)
+
+        parent = models.Parent.objects.create(name="ab")
+        assert self.count(queryset) == (2, 1)
+        assert self.count(queryset) == (2, 0)
+
+        parent.delete()
+        assert self.count(queryset) == (1, 1)
+
+    def test_many_to_many_changes(self, models):
+        parent = models.Parent.objects.create(name="a")
+        tag = models.Tag.objects.create(name="t")
+        queryset = models.Parent.objects.filter(tags__name="t")
+
+        assert self.count(queryset) == (0, 1)
+        parent.tags.add(tag)
+        assert self.count(queryset) == (1, 1)
+        assert self.count(queryset) == (1, 0)
+        parent.tags.clear()
+        assert self.count(queryset) == (0, 1)
+
+    def test_tables_of_subqueries(self, models):
+        from django.db.models import Exists, OuterRef
+
+        parent = models.Parent.objects.create(name="a")
+        tag = models.Tag.objects.create(name="x")
+        parent.tags.add(tag)
+        tags = models.Parent.tags.through.objects.filter(parent=OuterRef("pk"), tag__name="x")
+        queryset = models.Parent.objects.filter(Exists(tags))
+
+        assert self.count(queryset) == (1, 1)
+        assert self.count(queryset) == (1, 0)
+        tag.name = "y"
+        tag.save()
+        assert self.count(queryset) == (0, 1)
+
+        in_query = models.Parent.objects.filter(pk__in=models.Child.objects.values("parent"))
+        assert self.count(in_query) == (0, 1)
+        assert self.count(in_query) == (0, 1)
+
+    def test_exists_strategy_of_filtersets(self, models):
+        from apibase.filters import BaseFilter
+
+        class ParentFilter(BaseFilter):
+            multivalued_strategy = "exists"
+
+            class Meta:
+                model = models.Parent
+                fields = ["tags__name"]
+
+        tag = models.Tag.objects.create(name="x")
+        models.Parent.objects.create(name="a").tags.add(tag)
+
+        def filtered():
+            return ParentFilter({"tags__name": "x"}, queryset=models.Parent.objects.all()).qs
+
+        assert self.count(filtered()) == (1, 1)
+        assert self.count(filtered()) == (1, 0)
+        tag.name = "y"
+        tag.save()
+        assert self.count(filtered()) == (0, 1)
+
+    def test_other_models_are_counted_exactly(self, models):
+        parent = models.Parent.objects.create(name="a")
+        models.Child.objects.create(parent=parent, name="c")
+
+        assert self.count(models.Child.objects.all()) == (1, 1)
+        assert self.count(models.Child.objects.all()) == (1, 1)
+        # a join with an untracked table
+        assert self.count(models.Parent.objects.filter(child__name="c")) == (1, 1)
+        assert self.count(models.Parent.objects.filter(child__name="c")) == (1, 1)
+
+    def test_receivers_are_limited_to_the_models(self, models):
+        from django.db.models import signals
+
+        from apibase.paginations import bump_count_version
+
+        def connected(signal, sender):
+            return bump_count_version in signal._live_receivers(sender)
+
+        assert connected(signals.post_save, models.Parent)
+        assert connected(signals.m2m_changed, models.Parent.tags.through)
+        assert not connected(signals.post_save, models.Child)
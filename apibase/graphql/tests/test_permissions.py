@@ -0,0 +1,240 @@
+"""
+Tests for the permission snapshot of apibase.permissions.has_perm.
+"""
+
+import pytest
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def user(auth_tables):
+    from django.contrib.auth.models import Group, Permission, User
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.cache import cache
+
+    content_type = ContentType.objects.create(app_label="items", model="item")
+    for codename in ("view_item", "change_item"):
+        Permission.objects.create(codename=codename, name=codename, content_type=content_type)
+    group = Group.objects.create(name="viewers")
+    group.permissions.add(Permission.objects.get(codename="view_item"))
+    user = User.objects.create(username="alice")
+    user.groups.add(group)
+    cache.clear()
+    return user
+
+
+class GrantingBackend:
+    """grants through `has_perm` only"""
+
+    def authenticate(self, request, **credentials):
+        return None
+
+    def has_perm(self, user_obj, perm, obj=None):
+        return perm == "items.delete_item"
+
+
+def count_queries(func):
+    from django.db import connection
+
+    with CaptureQueriesContext(connection) as queries:
+        result = func()
+    return result, len(queries)
+
+
+def fresh(user):
+    """the user object of another request"""
+    return type(user).objects.get(pk=user.pk)
+
+
+class TestHasPerm:
+    def test_checks_are_answered_from_the_snapshot(self, user):
+        from apibase.permissions import has_perm
+
+        result, queries = count_queries(
+            lambda: [has_perm(user, code) for code in ("items.view_item", "items.change_item") * 50]
+        )
+        assert result == [True, False] * 50
+        assert queries == 2  # user and group permissions
+
+    def test_cross_request_cache_is_expired_by_group_changes(self, user, monkeypatch):
+        from django.contrib.auth.models import Group, Permission
+
+        from apibase.permissions import has_perm
+        from apibase.settings import apibase_settings
+
+        monkeypatch.setattr(apibase_settings, "PERMISSION_CACHE_TIMEOUT", 60)
+        assert has_perm(fresh(user), "items.change_item") is False
+
+        result, queries = count_queries(lambda: has_perm(fresh(user), "items.view_item"))
+        assert result is True and queries == 1  # the user row only
+
+        Group.objects.get(name="viewers").permissions.add(Permission.objects.get(codename="change_item"))
+        assert has_perm(fresh(user), "items.change_item") is True
+
+        user.groups.clear()
+        assert has_perm(fresh(user), "items.view_item") is False
+
+    def test_invalidation_is_connected_on_setup(self):
+        from django.contrib.auth.models import Group, Permission, User
+        from django.db.models import signals
+
+        from apibase.permissions import bump_perms_version
+
+        for through in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+            assert bump_perms_version in signals.m2m_changed._live_receivers(through)
+        for model in (Group, Permission):
+            assert bump_perms_version in signals.post_delete._live_receivers(model)
+
+    def test_backends_with_own_has_perm(self, user):
+        from django.test import override_settings
+
+        from apibase.permissions import has_perm
+
+        backends = ["django.contrib.auth.backends.ModelBackend", f"{__name__}.GrantingBackend"]
+        with override_settings(AUTHENTICATION_BACKENDS=backends):
+            assert has_perm(user, "items.delete_item") is True
+            assert has_perm(user, "items.view_item") is True
+            assert has_perm(user, "items.change_item") is False
+
+    def test_model_backend_subclasses_use_the_snapshot(self, user):
+        from django.test import override_settings
+
+        from apibase.permissions import has_perm
+
+        with override_settings(AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.AllowAllUsersModelBackend"]):
+            has_perm(user, "items.view_item")
+            result, queries = count_queries(lambda: has_perm(user, "items.change_item"))
+
+        assert result is False and queries == 0
+
+    def test_inactive_and_superuser(self, user):
+        from apibase.permissions import has_perm
+
+        user.is_superuser = True
+        assert has_perm(user, "items.unknown") is True
+        user.is_active = False
+        assert has_perm(user, "items.view_item") is False
+
+
+class TestPermissionsMap:
+    def create_router(self):
+        from rest_framework import viewsets
+
+        from apibase.permissions import Permission
+        from apibase.routers import DefaultRouter
+        from apibase.viewsets import ViewSetMixin
+
+        class CanView(Permission):
+            PERM_CODE = "items.view_item"
+
+        class CanChange(Permission):
+            PERM_CODE = "items.change_item"
+
+        class CanDelete(Permission):
+            PERM_CODE = "items.delete_item"
+
+        class ItemViewSet(ViewSetMixin, viewsets.ViewSet):
+            permission_classes = [CanView, CanChange]
+
+        class ItemAdminViewSet(ViewSetMixin, viewsets.ViewSet):
+            permission_classes = [CanDelete, CanView]
+
+        router = DefaultRouter()
+        router.register("items", ItemViewSet, basename="items")
+        router.register("admin-items", ItemAdminViewSet, basename="admin-items")
+        return router, ItemViewSet
+
+    def test_one_query_then_cached(self, user):
+        from apibase.permissions import clear_permission_objects
+
+        clear_permission_objects()
+        router, viewset = self.create_router()
+
+        result, queries = count_queries(router.permissions_map)
+        assert {k: [getattr(i, "codename", None) for i in v] for k, v in result.items()} == {
+            "items": ["view_item", "change_item"],
+            "admin-items": [None, "view_item"],
+        }
+        assert queries == 1
+
+        result, queries = count_queries(viewset.permissions)
+        assert [i.codename for i in result] == ["view_item", "change_item"] and queries == 0
+
+    def test_permission_changes_expire_the_cache(self, user):
+        from django.contrib.auth.models import Permission
+
+        router, _ = self.create_router()
+        router.permissions_map()
+        content_type = Permission.objects.get(codename="view_item").content_type
+        Permission.objects.create(codename="delete_item", name="delete_item", content_type=content_type)
+
+        assert router.permissions_map()["admin-items"][0].codename == "delete_item"
+
+    def test_missing_permissions_are_not_cached(self, user):
+        from django.contrib.auth.models import Permission
+
+        from apibase.permissions import get_permission_objects
+
+        content_type = Permission.objects.get(codename="view_item").content_type
+        assert get_permission_objects(["items.view_item", "items.delete_item", "invalid"]) == {
+            "items.view_item": Permission.objects.get(codename="view_item"),
+            "items.delete_item": None,
+            "invalid": None,
+        }
+
+        # created without signals
+        Permission.objects.bulk_create(
+            [Permission(codename="delete_item", name="delete_item", content_type=content_type)]
+        )
+        result, queries = count_queries(lambda: get_permission_objects(["items.view_item", "items.delete_item"]))
+        assert result["items.delete_item"].codename == "delete_item" and queries == 1
+
+        result, queries = count_queries(lambda: get_permission_objects(["items.view_item", "items.delete_item"]))
+        assert queries == 0
+
+
+class TestLoadPermissions:
+    def create_users(self, user):
+        from django.contrib.auth.models import Permission, User
+
+        bob = User.objects.create(username="bob")
+        bob.user_permissions.add(Permission.objects.get(codename="change_item"))
+        User.objects.create(username="root", is_superuser=True)
+        User.objects.create(username="carol", is_active=False)
+        return list(User.objects.order_by("username"))
+
+    def test_caches_are_filled_with_fixed_queries(self, user):
+        from apibase.contrib.models.methods import all_permissions, load_permissions
+
+        users = self.create_users(user)
+        _, queries = count_queries(lambda: load_permissions(users))
+        assert queries == 3  # direct, group and (for superusers) all permissions
+
+        result, queries = count_queries(
+            lambda: {i.username: (sorted(all_permissions(i)), i.has_perm("items.view_item")) for i in users}
+        )
+        assert queries == 0
+        assert result == {
+            "alice": (["items.view_item"], True),
+            "bob": (["items.change_item"], False),
+            "carol": ([], False),
+            "root": (["items.change_item", "items.view_item"], True),
+        }
+
+    def test_loader_batches_users(self, user):
+        from promise import Promise
+
+        from apibase.contrib.schema.query import PermissionsLoader
+
+        users = self.create_users(user)
+        loader = PermissionsLoader()
+        result, queries = count_queries(
+            lambda: Promise.resolve(None).then(lambda _: Promise.all([loader.load(i) for i in users])).get()
+        )
+        assert [sorted(i) for i in result] == [
+            ["items.view_item"],
+            ["items.change_item"],
+            [],
+            ["items.change_item", "items.view_item"],
+        ]
+        assert queries == 3
@@ -0,0 +1,34 @@
+"""
+Tests for persisted queries (apibase.graphql.persisted).
+"""
+
+import pytest
+
+
+def extensions(query_hash):
+    return {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+
+
+class TestResolve:
+    def test_plain_query_is_passed_through(self):
+        from apibase.graphql.persisted import resolve
+
+        assert resolve("{ a }", None) == "{ a }"
+
+    def test_first_seen_query_is_registered(self):
+        from apibase.graphql.persisted import PersistedQueryError, resolve, sha256
+
+        query = "{ registered }"
+        with pytest.raises(PersistedQueryError) as error:
+            resolve(None, extensions(sha256(query)))
+        assert error.value.invalid is False
+
+        assert resolve(query, extensions(sha256(query))) == query
+        assert resolve(None, extensions(sha256(query))) == query
+
+    def test_hash_mismatch(self):
+        from apibase.graphql.persisted import PersistedQueryError, resolve
+
+        with pytest.raises(PersistedQueryError) as error:
+            resolve("{ a }", extensions("0" * 64))
+        assert error.value.extensions == {"code": "INVALID_PERSISTED_QUERY_HASH"}
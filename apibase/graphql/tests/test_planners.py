@@ -0,0 +1,164 @@
+"""
+Tests for queryset planning from serializers (apibase.planners).
+"""
+
+import pytest
+
+
+@pytest.fixture
+def models():
+    from . import models
+
+    return models
+
+
+def create_serializer(model, fields, base=None, **declared):
+    from rest_framework import serializers
+
+    meta = type("Meta", (), {"model": model, "fields": fields})
+    return type(f"{model.__name__}Serializer", (base or serializers.ModelSerializer,), {"Meta": meta, **declared})
+
+
+def plan(serializer_class):
+    from apibase.planners import plan_serializer
+
+    return plan_serializer(serializer_class())
+
+
+class TestPlanSerializer:
+    def test_primary_keys_are_not_joined(self, models):
+        assert not plan(create_serializer(models.Child, ["id", "parent", "name"]))
+
+    def test_nested(self, models):
+        parent = create_serializer(models.Parent, ["id", "name", "tags"])
+        child = create_serializer(models.Child, ["id", "parent", "name"], parent=parent())
+        profile = create_serializer(models.Profile, ["id", "bio"])
+
+        result = plan(
+            create_serializer(
+                models.Parent, ["id", "child_set", "profile"], child_set=child(many=True), profile=profile()
+            )
+        )
+
+        assert result.select_related == ("profile",)
+        # joins below a to-many relation are prefetched
+        assert result.prefetch_related == ("child_set", "child_set__parent", "child_set__parent__tags")
+
+    def test_source_star(self, models):
+        from rest_framework import serializers
+
+        parent = create_serializer(models.Parent, ["id", "name"])
+        flat = create_serializer(models.Child, ["name", "parent"], base=serializers.ModelSerializer, parent=parent())
+
+        result = plan(create_serializer(models.Child, ["id", "flat"], flat=flat(source="*")))
+
+        assert result.select_related == ("parent",)
+        assert result.prefetch_related == ()
+
+    def test_display_field(self, models):
+        from apibase.serializers import DisplayField
+
+        result = plan(
+            create_serializer(
+                models.Child,
+                ["id", "parent_display", "display"],
+                parent_display=DisplayField(attr_name="parent"),
+                display=DisplayField(),
+            )
+        )
+
+        assert result.select_related == ("parent",)
+
+    def test_declared_lookups(self, models):
+        # what `__str__` or `patch_result` touch
+        child = create_serializer(models.Child, ["id", "name"])
+        child.Meta.select_related = ["parent"]
+        parent = create_serializer(models.Parent, ["id", "name"])
+        parent.Meta.prefetch_related = ["tags"]
+
+        assert plan(child).select_related == ("parent",)
+        assert plan(parent).prefetch_related == ("tags",)
+
+
+class TestPlanView:
+    def create_view_class(self, serializer_class):
+        from apibase.viewsets import BaseModelViewSet
+
+        return type("ChildViewSet", (BaseModelViewSet,), {"serializer_class": serializer_class})
+
+    def create_view(self, view_class):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        return view_class(request=Request(APIRequestFactory().get("/")), format_kwarg=None, action="list", kwargs={})
+
+    def test_plan_of_the_context_serializer(self, models):
+        from rest_framework import serializers
+
+        parent = create_serializer(models.Parent, ["id", "name"])
+
+        class ChildSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = models.Child
+                fields = ["id", "name"]
+
+            def get_fields(self):
+                # the parent is rendered for requests only
+                fields = super().get_fields()
+                if self.context.get("request"):
+                    fields["parent"] = parent()
+                return fields
+
+        view = self.create_view(self.create_view_class(ChildSerializer))
+
+        assert view.get_queryset_plan().select_related == ("parent",)
+
+    def test_plan_is_cached_per_class(self, models, monkeypatch):
+        from apibase import planners
+
+        calls = []
+        plan_serializer = planners.plan_serializer
+        monkeypatch.setattr(planners, "plan_serializer", lambda *args: calls.append(args) or plan_serializer(*args))
+        serializer_class = create_serializer(
+            models.Child, ["id", "parent"], parent=create_serializer(models.Parent, ["id"])()
+        )
+        view_class = self.create_view_class(serializer_class)
+
+        plans = [self.create_view(view_class).get_queryset_plan() for _ in range(2)]
+        other = self.create_view(self.create_view_class(serializer_class)).get_queryset_plan()
+
+        assert len(calls) == 2
+        assert plans[0] is plans[1] and plans[0] is not other
+        assert plans[0].select_related == other.select_related == ("parent",)
+
+
+class TestPlanCache:
+    def test_least_recently_used_is_dropped(self):
+        from apibase.planners import PlanCache
+
+        cache = PlanCache(maxsize=2)
+        cache.get("a", lambda: 1)
+        cache.get("b", lambda: 2)
+        assert cache.find("a") == 1
+        cache.put("c", 3)
+
+        assert list(cache.plans) == ["a", "c"]
+        assert cache.find("b") is None
+        assert cache.get("a", lambda: 0) == 1
+
+    def test_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from apibase.planners import PlanCache
+
+        cache = PlanCache(maxsize=8)
+
+        def work(seed):
+            for i in range(2000):
+                key = (seed * 7 + i) % 32
+                assert cache.get(key, lambda key=key: key) == key
+            return True
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert all(executor.map(work, range(8)))
+        assert len(cache.plans) == 8
@@ -0,0 +1,62 @@
+"""
+Tests for streamed CSV (apibase.renderers.stream_table).
+"""
+
+import codecs
+
+import pytest
+
+ROWS = [{"id": i, "name": f"名前{i}", "owner": {"id": i * 10, "name": f"o,{i}"}} for i in range(7)]
+
+
+def chunked(rows, size):
+    return [rows[i : i + size] for i in range(0, len(rows), size)]
+
+
+def render(rows, **context):
+    from apibase.renderers import CsvRenderer
+
+    return CsvRenderer().render(rows, renderer_context=context)
+
+
+def stream(rows, size, **kwargs):
+    from apibase.renderers import stream_table
+
+    return b"".join(stream_table(chunked(rows, size), **kwargs))
+
+
+class TestStreamTable:
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 100])
+    def test_equals_renderer_across_chunks(self, size):
+        assert stream(ROWS, size) == render(ROWS)
+
+    @pytest.mark.parametrize("size", [1, 3])
+    def test_header_and_labels(self, size):
+        header = ["owner.name", "id"]
+        labels = {"id": "ID", "owner.name": "Owner"}
+
+        result = stream(ROWS, size, header=header, labels=labels)
+
+        assert result == render(ROWS, header=header, labels=labels)
+        assert result.startswith(b"Owner,ID\r\n")
+
+    @pytest.mark.parametrize("size", [1, 3])
+    def test_bom_is_written_once(self, size):
+        result = stream(ROWS, size, encoding="utf-8-sig")
+
+        assert result == render(ROWS, encoding="utf-8-sig")
+        assert result.startswith(codecs.BOM_UTF8)
+        assert result.count(codecs.BOM_UTF8) == 1
+
+    def test_encoding(self):
+        assert stream(ROWS, 2, encoding="cp932") == render(ROWS, encoding="cp932")
+
+    def test_tsv(self):
+        result = stream(ROWS, 2, writer_opts={"delimiter": "\t"})
+
+        assert result == render(ROWS, writer_opts={"delimiter": "\t"})
+        assert result.split(b"\r\n")[1] == "0\t名前0\t0\to,0".encode()
+
+    def test_no_rows(self):
+        assert stream([], 2) == b""
+        assert stream([], 2, header=["id", "name"], labels={"id": "ID"}) == b"ID,name\r\n"
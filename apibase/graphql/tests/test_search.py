@@ -0,0 +1,112 @@
+"""
+Tests for the WordFilter search backends (apibase.search).
+"""
+
+import pytest
+
+
+@pytest.fixture
+def users(auth_tables):
+    from django.contrib.auth.models import Group, User
+    from django.db import connection
+
+    from apibase.search import FTS5Search
+
+    rows = {
+        "alice": ("Ａｌｉｃｅ", ["営業部"]),
+        "bob": ("ﾎﾞﾌﾞ", ["staff"]),
+        "carol": ("Carol_1", ["営業部", "admin"]),
+        "dave": ("ダブ", []),
+    }
+    for username, (first_name, groups) in rows.items():
+        user = User.objects.create(username=username, first_name=first_name)
+        user.groups.set([Group.objects.get_or_create(name=name)[0] for name in groups])
+
+    search = FTS5Search(lookups=["first_name", "groups__name"])
+    search.rebuild(User.objects.all())
+    yield User, search
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE "{search.table(User)}"')
+
+
+def search_usernames(users, value, backend=True):
+    from apibase.filters import WordFilter
+
+    User, search = users
+    word = WordFilter(lookups=["first_name", "groups__name"], backend=search if backend else None, distinct=True)
+    return sorted(word.filter(User.objects.all(), value).values_list("username", flat=True))
+
+
+class TestNormalize:
+    def test_zenkaku_and_case(self):
+        from apibase.search import normalize
+
+        assert normalize("Ａｌｉｃｅ １２３") == "alice 123"
+        assert normalize("ﾎﾞﾌﾞ") == normalize("ボブ")
+
+
+class TestFTS5Search:
+    @pytest.mark.parametrize("value", ["Ａｌｉ", "営業", "car", "ca", "1", "ボ", "xyz"])
+    def test_results_equal_like(self, users, value):
+        assert search_usernames(users, value) == search_usernames(users, value, backend=False)
+
+    def test_words_are_normalized(self, users):
+        assert search_usernames(users, "ALICE") == ["alice"]
+        assert search_usernames(users, "ボブ") == ["bob"]
+
+    def test_words_may_match_different_rows_of_a_relation(self, users):
+        # LIKE joins the groups once for every word
+        assert search_usernames(users, "営業 admin") == ["carol"]
+
+    def test_like_wildcards_are_escaped(self, users):
+        assert search_usernames(users, "_1") == ["carol"]
+        assert search_usernames(users, "%") == []
+
+    @pytest.fixture
+    def connected(self, users):
+        from django.db.models import signals
+
+        User, search = users
+        search.connect(User)
+        yield users
+        signals.post_save.disconnect(sender=User, dispatch_uid="apibase_search_auth.User")
+        signals.post_delete.disconnect(sender=User, dispatch_uid="apibase_search_auth.User")
+        signals.m2m_changed.disconnect(sender=User.groups.through, dispatch_uid="apibase_search_auth.User_groups")
+
+    def test_document_follows_deletes(self, connected):
+        User, _ = connected
+        User.objects.create(username="erin", first_name="Erin")
+        assert search_usernames(connected, "erin") == ["erin"]
+        User.objects.get(username="erin").delete()
+        assert search_usernames(connected, "erin") == []
+
+    def test_document_follows_many_to_many_changes(self, connected):
+        from django.contrib.auth.models import Group
+
+        User, _ = connected
+        group = Group.objects.create(name="経理部")
+        erin = User.objects.create(username="erin", first_name="Erin")
+
+        erin.groups.add(group)
+        assert search_usernames(connected, "経理") == ["erin"]
+        erin.groups.remove(group)
+        assert search_usernames(connected, "経理") == []
+        erin.groups.set([group])
+        erin.groups.clear()
+        assert search_usernames(connected, "経理") == []
+
+    def test_document_follows_changes_from_the_other_side(self, connected):
+        from django.contrib.auth.models import Group
+
+        User, _ = connected
+        group = Group.objects.create(name="経理部")
+
+        group.user_set.add(*User.objects.filter(username__in=["alice", "dave"]))
+        assert search_usernames(connected, "経理") == ["alice", "dave"]
+        group.user_set.remove(User.objects.get(username="alice"))
+        assert search_usernames(connected, "経理") == ["dave"]
+        group.user_set.clear()
+        assert search_usernames(connected, "経理") == []
+        # the other lookups are kept
+        assert search_usernames(connected, "ダブ") == ["dave"]
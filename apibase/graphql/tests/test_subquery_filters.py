@@ -0,0 +1,76 @@
+"""
+Tests for filtering across multi-valued relations with subqueries (apibase.filters.BaseFilter.multivalued_strategy).
+"""
+
+import pytest
+
+
+@pytest.fixture
+def users(auth_tables):
+    from django.contrib.auth.models import Group, User
+
+    staff, sales, admin = (Group.objects.create(name=name) for name in ("staff", "sales", "admin"))
+    rows = {
+        "alice": [staff, sales],
+        "bob": [staff],
+        "carol": [sales, admin],
+        "dave": [],
+    }
+    for username, groups in rows.items():
+        User.objects.create(username=username).groups.set(groups)
+    return User
+
+
+def create_filterset(strategy):
+    import django_filters
+    from django.contrib.auth.models import User
+
+    from apibase.filters import BaseFilter, WordFilter
+
+    class UserFilter(BaseFilter):
+        multivalued_strategy = strategy
+
+        group = django_filters.CharFilter(field_name="groups__name", lookup_expr="icontains", distinct=True)
+        word = WordFilter(lookups=["username", "groups__name"], distinct=True)
+
+        class Meta:
+            model = User
+            fields = ["username"]
+
+    return UserFilter
+
+
+def filter_usernames(users, strategy, data):
+    qs = create_filterset(strategy)(data, queryset=users.objects.all()).qs
+    return list(qs.order_by("username").values_list("username", flat=True)), str(qs.query)
+
+
+class TestMultivaluedStrategy:
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {"group": "s"},
+            {"group": "a", "username": "carol"},
+            {"word": "staff sales"},
+            {"word": "a"},
+            {"id__excludes": [1], "group": "staff"},
+            {},
+        ],
+    )
+    def test_results_equal_distinct(self, users, data):
+        expected, _ = filter_usernames(users, "distinct", data)
+        for strategy in ("exists", "in"):
+            assert filter_usernames(users, strategy, data)[0] == expected
+
+    def test_no_distinct_in_subquery_mode(self, users):
+        _, sql = filter_usernames(users, "exists", {"group": "s"})
+        assert "DISTINCT" not in sql and "EXISTS" in sql
+
+        _, sql = filter_usernames(users, "distinct", {"group": "s"})
+        assert "DISTINCT" in sql
+
+    def test_related_filterset_uses_exists(self):
+        from apibase.filters import make_related_filterset
+
+        filterset_class = make_related_filterset("RelatedUserFilter", groups=create_filterset("distinct"))
+        assert filterset_class.multivalued_strategy == "exists"
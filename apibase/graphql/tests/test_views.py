@@ -0,0 +1,98 @@
+"""
+Tests for the schema views (apibase.views.sdl/introspection).
+"""
+
+import gzip
+import json
+
+import graphene
+import pytest
+
+
+class Query(graphene.ObjectType):
+    name = graphene.String()
+
+
+schema = graphene.Schema(query=Query)
+
+
+@pytest.fixture(autouse=True)
+def graphene_schema(monkeypatch):
+    from graphene_django.settings import graphene_settings
+
+    monkeypatch.setattr(graphene_settings, "SCHEMA", schema)
+
+
+def get(view, **headers):
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    request = APIRequestFactory().get("/", **headers)
+    force_authenticate(request, user=User(username="alice"))
+    return view(request)
+
+
+@pytest.fixture(params=["sdl", "introspection"])
+def view(request):
+    from apibase import views
+
+    return getattr(views, request.param)
+
+
+class TestSchemaViews:
+    def test_documents(self):
+        from apibase import views
+
+        sdl = get(views.sdl)
+        introspection = get(views.introspection)
+
+        assert sdl["Content-Type"] == "text/plain" and b"name: String" in sdl.content
+        assert introspection["Content-Type"] == "application/json"
+        assert json.loads(introspection.content)["data"]["__schema"]["queryType"] == {"name": "Query"}
+
+    def test_etag_is_stable(self, view):
+        first, second = get(view), get(view)
+
+        assert first["ETag"] == second["ETag"] and first["ETag"].startswith('"')
+        assert "Accept-Encoding" in first["Vary"]
+
+    def test_authentication_is_required(self, view):
+        from rest_framework.test import APIRequestFactory
+
+        assert view(APIRequestFactory().get("/")).status_code in (401, 403)
+
+    @pytest.mark.parametrize("if_none_match", ["{}", "W/{}", '"other", {}', "*", 'W/"other", W/{}'])
+    def test_not_modified(self, view, if_none_match):
+        etag = get(view)["ETag"]
+
+        response = get(view, HTTP_IF_NONE_MATCH=if_none_match.format(etag))
+
+        assert response.status_code == 304
+        assert response["ETag"] == etag and not response.content
+
+    @pytest.mark.parametrize("if_none_match", ['"other"', 'W/"other"', ""])
+    def test_modified(self, view, if_none_match):
+        assert get(view, HTTP_IF_NONE_MATCH=if_none_match).status_code == 200
+
+    @pytest.mark.parametrize("accept_encoding", ["gzip", "deflate, gzip;q=0.5", "*", "GZIP ; q=1"])
+    def test_gzip(self, view, accept_encoding):
+        plain = get(view)
+
+        response = get(view, HTTP_ACCEPT_ENCODING=accept_encoding)
+
+        assert response["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.content) == plain.content
+        assert response["ETag"] == plain["ETag"]
+
+    @pytest.mark.parametrize("accept_encoding", ["", "deflate", "gzip;q=0", "gzip;q=0.0, deflate", "*, gzip;q=0"])
+    def test_identity(self, view, accept_encoding):
+        response = get(view, HTTP_ACCEPT_ENCODING=accept_encoding)
+
+        assert not response.has_header("Content-Encoding")
+
+    def test_gzip_can_be_disabled(self, view, monkeypatch):
+        from apibase.settings import apibase_settings
+
+        monkeypatch.setattr(apibase_settings, "SCHEMA_GZIP", False)
+
+        assert not get(view, HTTP_ACCEPT_ENCODING="gzip").has_header("Content-Encoding")
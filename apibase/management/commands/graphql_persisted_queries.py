@@ -0,0 +1,30 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apibase.graphql import persisted
+from apibase.settings import apibase_settings
+
+
+class Command(BaseCommand):
+    help = "Register the .graphql templates as persisted queries (APIBASE PERSISTED_QUERY_MANIFEST)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", help="manifest path (default: PERSISTED_QUERY_MANIFEST)")
+        parser.add_argument("--merge", action="store_true", help="keep the queries already in the manifest")
+
+    def handle(self, *args, **options):
+        path = options["output"] or apibase_settings.PERSISTED_QUERY_MANIFEST
+        if not path:
+            raise CommandError("set APIBASE PERSISTED_QUERY_MANIFEST or --output")
+        path = Path(path)
+
+        queries = json.loads(path.read_text()) if options["merge"] and path.exists() else {}
+        for name, source in persisted.find_documents().items():
+            query_hash = persisted.sha256(source)
+            queries[query_hash] = source
+            self.stdout.write(f"{query_hash} {name}")
+
+        path.write_text(json.dumps(queries, indent=2, sort_keys=True))
+        self.stdout.write(self.style.SUCCESS(f"{len(queries)} queries: {path}"))
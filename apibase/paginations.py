@@ -1,19 +1,200 @@
+import base64
+import hashlib
+import json
 from collections import OrderedDict
 
-from rest_framework import pagination, response
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, signals
+from django.db.models.expressions import RawSQL
+from django.db.models.sql import Query
+from django.db.models.sql.where import ExtraWhere
+from django.utils.functional import cached_property
+from rest_framework import exceptions, pagination, response
+from rest_framework.utils.urls import replace_query_param
+
+from .settings import apibase_settings
+
+COUNT_VERSION_KEY = "apibase:count:version:{}"
+# tables whose changes expire cached counts, see `connect_count_invalidation`
+count_tables = set()
+
+
+def bump_count_version(sender, action=None, **kwargs):
+    """post_save/post_delete/m2m_changed: expire cached counts of queries touching `sender`'s table"""
+    if action and not action.startswith("post_"):
+        return
+    key = COUNT_VERSION_KEY.format(sender._meta.db_table)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def connect_count_invalidation(models):
+    """expire cached counts on changes of `models` and of their many-to-many tables (AppConfig.ready)"""
+    for model in models:
+        uid = f"apibase_count_{model._meta.label}"
+        signals.post_save.connect(bump_count_version, sender=model, dispatch_uid=uid)
+        signals.post_delete.connect(bump_count_version, sender=model, dispatch_uid=uid)
+        count_tables.add(model._meta.db_table)
+
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                signals.m2m_changed.connect(
+                    bump_count_version, sender=through, dispatch_uid=f"apibase_count_{through._meta.label}"
+                )
+                count_tables.add(through._meta.db_table)
+
+
+def exact_count(queryset):
+    return queryset.count()
+
+
+def query_tables(query):
+    """tables read by `query` and its subqueries (EXISTS, `__in`), None when raw SQL may read others"""
+    if query.extra or query.combinator:
+        return None
+    tables = {i.table_name for i in query.alias_map.values()}
+    nodes = [query.where, *query.annotations.values()]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (RawSQL, ExtraWhere)):
+            return None
+        inner = node if isinstance(node, Query) else getattr(node, "query", None)
+        if isinstance(inner, Query):
+            inner_tables = query_tables(inner)
+            if inner_tables is None:
+                return None
+            tables |= inner_tables
+            continue
+        nodes.extend(getattr(node, "children", ()))
+        if hasattr(node, "get_source_expressions"):
+            nodes.extend(i for i in node.get_source_expressions() if i is not None)
+    return tables
+
+
+def cached_count(queryset, timeout=60):
+    """
+    exact count cached by a fingerprint of the SQL and the data versions of its tables
+
+    - only queries of tables of `COUNT_CACHE_MODELS` are cached, others are counted exactly;
+      the tables of subqueries count too
+    - saving/deleting any row of a joined table (through model signals) expires the entry;
+      `QuerySet.update()`/`bulk_*` do not send signals and rely on `timeout`
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    tables = query_tables(queryset.query)
+    if tables is None or not count_tables.issuperset(tables):
+        # changes of the other tables would not expire the entry
+        return queryset.count()
+    versions = cache.get_many([COUNT_VERSION_KEY.format(i) for i in sorted(tables)])
+    fingerprint = repr((queryset.db, sql, params, sorted(versions.items())))
+    key = f"apibase:count:{hashlib.sha1(fingerprint.encode()).hexdigest()}"
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+def estimated_count(queryset):
+    """planner row estimate (PostgreSQL), None when not available"""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CountingPaginator(Paginator):
+    """Paginator counting with a strategy: "exact", "cached" or "estimated" """
+
+    def __init__(self, *args, count_strategy="exact", count_timeout=60, estimate_threshold=100000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_strategy = count_strategy
+        self.count_timeout = count_timeout
+        self.estimate_threshold = estimate_threshold
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, "query"):
+            self.count_strategy = "exact"
+            return len(queryset)
+
+        if self.count_strategy == "estimated":
+            estimate = estimated_count(queryset)
+            # small tables are counted exactly: estimates are poor there and counting is cheap
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+            self.count_strategy = "exact"
+
+        if self.count_strategy == "cached":
+            return cached_count(queryset, timeout=self.count_timeout)
+        return exact_count(queryset)
 
 
 class Pagination(pagination.PageNumberPagination):
     page_size = 16
     max_page_size = 200
     page_size_query_param = "page_size"
+    # None: apibase_settings.PAGINATION_COUNT_STRATEGY
+    count_strategy = None
+    count_cache_timeout = 60
+    count_estimate_threshold = 100000
+    # pages listed in `page_range` around the current page, None for all of them
+    page_range_limit = None
+
+    def get_count_strategy(self, view):
+        return (
+            getattr(view, "count_strategy", None) or self.count_strategy or apibase_settings.PAGINATION_COUNT_STRATEGY
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def django_paginator_class(self, *args, **kwargs):
+        return CountingPaginator(
+            *args,
+            count_strategy=self.get_count_strategy(self.view),
+            count_timeout=self.count_cache_timeout,
+            estimate_threshold=self.count_estimate_threshold,
+            **kwargs,
+        )
+
+    def get_page_range(self):
+        paginator = self.page.paginator
+        if self.page_range_limit is None:
+            return list(paginator.page_range)
+        start = max(
+            1, min(self.page.number - self.page_range_limit // 2, paginator.num_pages - self.page_range_limit + 1)
+        )
+        return list(range(start, min(start + self.page_range_limit, paginator.num_pages + 1)))
 
     def get_paginated_response(self, data):
         return response.Response(
             OrderedDict(
                 [
                     ("count", self.page.paginator.count),
-                    ("page_range", list(self.page.paginator.page_range)),
+                    ("count_strategy", self.page.paginator.count_strategy),
+                    ("page_range", self.get_page_range()),
                     ("current_page", self.page.number),
                     ("next", self.get_next_link()),
                     ("previous", self.get_previous_link()),
@@ -21,3 +202,121 @@ class Pagination(pagination.PageNumberPagination):
                 ]
             )
         )
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    keyset (seek) pagination over a stable ordering, without OFFSET
+
+    - `ordering` (or `view.keyset_ordering`) must end with a unique field, the pk is appended otherwise
+    - ordering fields are model fields of the queryset's model and must not be NULL
+    - `next`/`previous` are opaque cursors, `count` is only computed with `?count=1` (or `with_count`)
+    """
+
+    page_size = 16
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    ordering = ("-pk",)
+    with_count = False
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_ordering(self, queryset, view):
+        ordering = list(getattr(view, "keyset_ordering", None) or self.ordering)
+        pk = queryset.model._meta.pk.name
+        if not {"pk", pk} & {i.lstrip("-") for i in ordering}:
+            ordering.append(f"-{pk}" if ordering[-1].startswith("-") else pk)
+        return ordering
+
+    def get_keys(self, queryset, ordering):
+        """[(name, field, descending)]"""
+        opts = queryset.model._meta
+        res = []
+        for item in ordering:
+            name = item.lstrip("-")
+            field = opts.pk if name == "pk" else opts.get_field(name)
+            res.append((name, field, item.startswith("-")))
+        return res
+
+    def encode_cursor(self, instance, reverse):
+        # `value_to_string()` is lossless (full microseconds of datetimes), `to_python()` reads it back
+        values = [field.value_to_string(instance) for _, field, _ in self.keys]
+        data = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """(values, reverse) or None"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if len(data["v"]) != len(self.keys):
+                raise ValueError(cursor)
+            values = [field.to_python(value) for (_, field, _), value in zip(self.keys, data["v"])]
+            return values, bool(data["r"])
+        except (TypeError, ValueError, KeyError, ValidationError) as err:
+            raise exceptions.NotFound(self.invalid_cursor_message) from err
+
+    def seek(self, queryset, values, reverse):
+        """rows after `values` in the ordering (before them when `reverse`)"""
+        condition = Q()
+        for index, (name, _, descending) in enumerate(self.keys):
+            lookup = "lt" if descending != reverse else "gt"
+            step = Q(**{f"{name}__{lookup}": values[index]})
+            for (prev_name, _, _), prev_value in zip(self.keys[:index], values):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return queryset.filter(condition)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size_value = self.get_page_size(request)
+        self.keys = self.get_keys(queryset, self.get_ordering(queryset, view))
+
+        requested = request.query_params.get(self.count_query_param, "").lower() in ("1", "true", "yes")
+        self.count = queryset.count() if (self.with_count or requested) else None
+
+        position = self.decode_cursor(request)
+        values, reverse = position or (None, False)
+        ordering = [f"{'-' if descending != reverse else ''}{name}" for name, _, descending in self.keys]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = self.seek(queryset, values, reverse)
+
+        rows = list(queryset[: self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+        if reverse:
+            rows.reverse()
+
+        self.next = self.previous = None
+        if rows:
+            if has_more or reverse:
+                self.next = self.encode_cursor(rows[-1], False)
+            if (has_more and reverse) or (position and not reverse):
+                self.previous = self.encode_cursor(rows[0], True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return response.Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("page_size", self.page_size_value),
+                    ("next", self.next),
+                    ("previous", self.previous),
+                    ("results", data),
+                ]
+            )
+        )
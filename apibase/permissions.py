@@ -1,16 +1,131 @@
-from functools import wraps
+import operator
+from functools import reduce, wraps
 from logging import getLogger
 
+from django.core.cache import cache
+from django.db.models import Q, signals
 from rest_framework import permissions
 
+from .settings import apibase_settings
+
 logger = getLogger(__name__)
 
+PERMS_VERSION_KEY = "apibase:perms:version"
+PERMS_SNAPSHOT_ATTR = "_apibase_perms"
+
+
+def bump_perms_version(sender, action=None, **kwargs):
+    """m2m_changed of groups/permissions, Group/Permission deletion: expire cached permission sets"""
+    if action and not action.startswith("post_"):
+        return
+    try:
+        cache.incr(PERMS_VERSION_KEY)
+    except ValueError:
+        cache.set(PERMS_VERSION_KEY, 1, None)
+
+
+def connect_perms_invalidation():
+    """expire cached permission sets on group/permission changes (AppConfig.ready)"""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group, Permission
+
+    user_model = get_user_model()
+    for through in (user_model.groups.through, user_model.user_permissions.through, Group.permissions.through):
+        signals.m2m_changed.connect(bump_perms_version, sender=through, dispatch_uid=f"apibase_perms_{through}")
+    for model in (Group, Permission):
+        signals.post_delete.connect(bump_perms_version, sender=model, dispatch_uid=f"apibase_perms_{model}")
+
+
+_permission_objects = {}
+
+
+def clear_permission_objects(sender=None, **kwargs):
+    _permission_objects.clear()
+
+
+def connect_permission_objects_invalidation():
+    """clear cached Permission objects on Permission/ContentType changes (AppConfig.ready)"""
+    from django.contrib.auth.models import Permission as AuthPermission
+    from django.contrib.contenttypes.models import ContentType
+
+    for model in (AuthPermission, ContentType):
+        uid = f"apibase_permission_objects_{model._meta.label}"
+        signals.post_save.connect(clear_permission_objects, sender=model, dispatch_uid=uid)
+        signals.post_delete.connect(clear_permission_objects, sender=model, dispatch_uid=uid)
+
+
+def get_permission_objects(codes):
+    """
+    {"app_label.codename": auth Permission (None when missing)}, resolved in one query;
+    found ones are cached in the process until a Permission/ContentType is saved or deleted
+    (missing ones are looked up again: they may be created without signals, e.g. by migrations)
+    """
+    from django.contrib.auth.models import Permission as AuthPermission
+
+    missing = {code for code in codes if code not in _permission_objects}
+    pairs = [code.split(".", 1) for code in missing if "." in code]
+    if pairs:
+        query = reduce(
+            operator.or_, (Q(content_type__app_label=app_label, codename=codename) for app_label, codename in pairs)
+        )
+        for obj in AuthPermission.objects.filter(query).select_related("content_type"):
+            _permission_objects.setdefault(f"{obj.content_type.app_label}.{obj.codename}", obj)
+    return {code: _permission_objects.get(code) for code in codes}
+
+
+def get_perms(user):
+    """
+    permission codes of `user`, loaded once per request (kept on the user object of the request)
+
+    with APIBASE PERMISSION_CACHE_TIMEOUT, shared across requests by user and
+    a version bumped by group/permission changes
+    """
+    perms = getattr(user, PERMS_SNAPSHOT_ATTR, None)
+    if perms is not None:
+        return perms
+
+    timeout = apibase_settings.PERMISSION_CACHE_TIMEOUT
+    if timeout:
+        key = f"apibase:perms:{user.pk}:{cache.get(PERMS_VERSION_KEY, 0)}"
+        perms = cache.get(key)
+        if perms is None:
+            perms = frozenset(user.get_all_permissions())
+            cache.set(key, perms, timeout)
+    else:
+        perms = frozenset(user.get_all_permissions())
+
+    setattr(user, PERMS_SNAPSHOT_ATTR, perms)
+    return perms
+
+
+def answers_from_permissions():
+    """whether every authentication backend answers `has_perm` from `get_all_permissions` (ModelBackend)"""
+    from django.contrib.auth import get_backends
+    from django.contrib.auth.backends import ModelBackend
+
+    return all(type(i).has_perm is ModelBackend.has_perm for i in get_backends())
+
+
+def has_perm(user, perm):
+    """
+    `user.has_perm(perm)` answered from the permission snapshot of the request
+
+    backends granting through their own `has_perm` are asked directly
+    """
+    if not user:
+        return False
+    if not (user.is_authenticated and user.is_active) or not answers_from_permissions():
+        return user.has_perm(perm)
+    if user.is_superuser:
+        return True
+    return perm in get_perms(user)
+
 
 def has_perms(func, permission, *args, **kwargs):
     def wrapper(func):
         @wraps(func)
         def wrapped(self, info, *func_args, **func_kwargs):
-            if not info.context.user.has_perm(permission):
+            if not has_perm(info.context.user, permission):
                 return None
             return func(self, info, *func_args, **func_kwargs)
 
@@ -39,13 +154,13 @@ class Permission(permissions.IsAuthenticated):
 
     @classmethod
     def check_info(cls, info, *args, **kwargs):
-        return info.context.user.has_perm(cls.PERM_CODE)
+        return has_perm(info.context.user, cls.PERM_CODE)
 
     def has_permission(self, request, view):
         if not request.user:
             return False
         isvalid = False if self.PRIVATE else (request.method in permissions.SAFE_METHODS)
-        isvalid = isvalid or request.user.has_perm(self.PERM_CODE)
+        isvalid = isvalid or has_perm(request.user, self.PERM_CODE)
         if not isvalid:
             logger.info(f"{request.user} has not {self.PERM_CODE}")
         return isvalid
@@ -54,6 +169,6 @@ class Permission(permissions.IsAuthenticated):
         """check for graphql query"""
         permcode = permcode or self.PERM_CODE
         user = info.context.user
-        if not self.PRIVATE or user.is_staff or user.has_perm(permcode):
+        if not self.PRIVATE or user.is_staff or has_perm(user, permcode):
             return True
         return False
@@ -0,0 +1,229 @@
+"""
+select_related / prefetch_related planning from a serializer field graph
+
+- forward FK/O2O and reverse O2O relations are joined with `select_related`
+- to-many relations (and everything below them) are loaded with `prefetch_related`
+- `Meta.select_related` / `Meta.prefetch_related` declare what `__str__` (DisplayField)
+  or `patch_result` touch, relative to the serializer's model
+"""
+
+import threading
+from collections import OrderedDict
+from logging import getLogger
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import relations, serializers
+
+from . import serializers as apibase_serializers
+
+logger = getLogger(__name__)
+
+PLAN_CACHE_SIZE = 256
+
+
+class QuerysetPlan:
+    def __init__(self, select_related=None, prefetch_related=None, only=None):
+        self.select_related = tuple(sorted(set(select_related or [])))
+        self.prefetch_related = tuple(sorted(set(prefetch_related or [])))
+        self.only = only
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetch_related or self.only)
+
+    def __str__(self):
+        res = f"select_related={','.join(self.select_related)};prefetch_related={','.join(self.prefetch_related)}"
+        return f"{res};only={','.join(self.only)}" if self.only else res
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        only = self.only and with_joined_columns(queryset, self.only)
+        if only:
+            queryset = queryset.only(*only)
+        return queryset
+
+
+def joined_paths(select_related, prefix=""):
+    """paths of a `query.select_related` tree"""
+    for name, sub in select_related.items():
+        path = f"{prefix}{name}"
+        yield path
+        yield from joined_paths(sub, prefix=f"{path}__")
+
+
+def with_joined_columns(queryset, columns):
+    """
+    `columns` plus the foreign keys joined by `select_related` of `queryset`
+    (a deferred join raises FieldError), None when they can not be added
+    """
+    select_related = queryset.query.select_related
+    if select_related is True:
+        return None
+    columns = list(columns)
+    for path in joined_paths(select_related or {}):
+        model = queryset.model
+        for name in path.split("__"):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not (field.concrete and (field.many_to_one or field.one_to_one)):
+                # reverse one-to-one
+                return None
+            model = field.related_model
+        if path not in columns:
+            columns.append(path)
+    return columns
+
+
+def get_relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # reverse relations by accessor name ("<model>_set" or `related_name`)
+        return next((i for i in model._meta.related_objects if i.get_accessor_name() == name), None)
+    return field if field.is_relation else None
+
+
+class Planner:
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+
+    def add(self, path, prefetching):
+        (self.prefetch_related if prefetching else self.select_related).append(path)
+
+    def walk_path(self, model, attrs, prefix, prefetching):
+        """follow `attrs` through model relations, returns (model, path, prefetching) or None"""
+        path = prefix
+        for attr in attrs:
+            relation = model and get_relation(model, attr)
+            if not relation:
+                return None
+            path = f"{path}__{attr}" if path else attr
+            if relation.many_to_many or relation.one_to_many or not relation.related_model:
+                # GenericForeignKey has no related_model: prefetch only
+                prefetching = True
+            self.add(path, prefetching)
+            model = relation.related_model
+        return model, path, prefetching
+
+    def walk_declared(self, serializer, model, prefix, prefetching):
+        meta = getattr(serializer, "Meta", None)
+        for name in getattr(meta, "select_related", None) or []:
+            self.walk_path(model, name.split("__"), prefix, prefetching)
+        for name in getattr(meta, "prefetch_related", None) or []:
+            self.walk_path(model, name.split("__"), prefix, True)
+
+    def walk(self, serializer, model, prefix="", prefetching=False):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+
+        self.walk_declared(serializer, model, prefix, prefetching)
+
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+
+            if isinstance(
+                field,
+                (
+                    apibase_serializers.EndpointField,
+                    apibase_serializers.UrnField,
+                    apibase_serializers.DisplayField,
+                ),
+            ):
+                if field.attr_name:
+                    self.walk_path(model, [field.attr_name], prefix, prefetching)
+                continue
+
+            attrs = field.source_attrs
+            if not attrs:
+                if isinstance(field, serializers.BaseSerializer):
+                    # source="*"
+                    self.walk(field, model, prefix=prefix, prefetching=prefetching)
+                continue
+
+            if isinstance(field, relations.RelatedField) and field.use_pk_only_optimization() and len(attrs) == 1:
+                # `<name>_id` of the row is enough
+                continue
+
+            found = self.walk_path(model, attrs, prefix, prefetching)
+            if not found:
+                continue
+
+            related_model, path, related_prefetching = found
+            if isinstance(field, relations.ManyRelatedField):
+                self.add(path, True)
+            elif isinstance(field, serializers.BaseSerializer) and related_model:
+                self.walk(field, related_model, prefix=path, prefetching=related_prefetching)
+
+        return self
+
+    def plan(self):
+        prefetched = set(self.prefetch_related)
+        return QuerysetPlan(
+            select_related=[i for i in self.select_related if i not in prefetched],
+            prefetch_related=self.prefetch_related,
+        )
+
+
+def plan_serializer(serializer, model=None):
+    model = model or serializer.Meta.model
+    return Planner().walk(serializer, model).plan()
+
+
+class PlanCache:
+    """plans by key, the least recently used dropped above `maxsize`"""
+
+    def __init__(self, maxsize=PLAN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.plans = OrderedDict()
+        self.lock = threading.Lock()
+
+    def find(self, key):
+        """cached plan of `key`, None on a miss"""
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.plans.move_to_end(key)
+            return plan
+
+    def put(self, key, plan):
+        with self.lock:
+            self.plans[key] = plan
+            self.plans.move_to_end(key)
+            while len(self.plans) > self.maxsize:
+                self.plans.popitem(last=False)
+        return plan
+
+    def get(self, key, build):
+        """plan of `key`, `build()` on a miss"""
+        plan = self.find(key)
+        return self.put(key, build()) if plan is None else plan
+
+    def clear(self):
+        with self.lock:
+            self.plans.clear()
+
+
+view_plans = PlanCache()
+
+
+def plan_view(view, fieldset=(None, ()), build=None):
+    """
+    plan of `view.get_serializer()`, built with the view's serializer context
+    once per (view class, serializer class, fieldset)
+    """
+    serializer_class = view.get_serializer_class()
+    if not issubclass(serializer_class, serializers.ModelSerializer):
+        return QuerysetPlan()
+
+    def build_plan():
+        plan = (build or plan_serializer)(view.get_serializer(), serializer_class.Meta.model)
+        logger.debug(f"{type(view).__name__}.{serializer_class.__name__} {fieldset}: {plan}")
+        return plan
+
+    return view_plans.get((type(view), serializer_class, *fieldset), build_plan)
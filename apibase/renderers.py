@@ -1,6 +1,10 @@
+import codecs
+import csv
+
 from rest_framework.renderers import BrowsableAPIRenderer, StaticHTMLRenderer
 from rest_framework.settings import api_settings
 from rest_framework_csv import renderers
+from rest_framework_csv.misc import Echo
 
 
 class BrowsableAPIRendererWithoutForms(BrowsableAPIRenderer):
@@ -17,6 +21,35 @@ class CsvRenderer(renderers.CSVRenderer):
         return super().render(data, media_type=media_type, renderer_context=renderer_context, writer_opts=writer_opts)
 
 
+def stream_table(chunks, header=None, labels=None, encoding="utf-8", writer_opts=None):
+    """
+    yield encoded CSV lines for chunks (lists) of serialized rows
+
+    - without `header`, columns are taken from the first chunk
+    - "utf-8-sig" writes the BOM only once
+    """
+    tablizer = CsvRenderer()
+    writer = csv.writer(Echo(), **(writer_opts or {}))
+
+    if codecs.lookup(encoding).name == "utf-8-sig":
+        yield codecs.BOM_UTF8
+        encoding = "utf-8"
+
+    first = True
+    for data in chunks:
+        if not header:
+            header = sorted({key for item in tablizer.flatten_data(data) for key in item})
+        rows = tablizer.tablize(data, header=header, labels=labels)
+        if not first:
+            next(rows, None)
+        for row in rows:
+            yield writer.writerow(row).encode(encoding)
+        first = False
+
+    if first and header:
+        yield writer.writerow([(labels or {}).get(i, i) for i in header]).encode(encoding)
+
+
 class BinaryRenderer(renderers.BaseRenderer):
     def render(self, data, media_type=None, renderer_context=None):
         return data
@@ -1,5 +1,7 @@
 from rest_framework.routers import DefaultRouter as DrfDefaultRouter
 
+from . import permissions
+
 
 class DefaultRouter(DrfDefaultRouter):
     def get_default_basename(self, viewset):
@@ -16,3 +18,13 @@ class DefaultRouter(DrfDefaultRouter):
     def __init__(self, *args, **kwargs):
         self.root_view_name = kwargs.pop("root_view_name", self.root_view_name)
         super().__init__(*args, **kwargs)
+
+    def permissions_map(self):
+        """{basename: [auth Permission]} of the registered viewsets (`ViewSetMixin.permissions`), in one query"""
+        codes = {
+            basename: viewset.perm_codes()
+            for _prefix, viewset, basename in self.registry
+            if hasattr(viewset, "perm_codes")
+        }
+        objects = permissions.get_permission_objects({code for i in codes.values() for code in i})
+        return {basename: [objects[code] for code in i] for basename, i in codes.items()}
@@ -3,15 +3,22 @@ from graphene.types import resolver
 # https://docs.graphene-python.org/projects/django/en/latest/queries/
 from graphene_django.rest_framework.mutation import SerializerMutation
 from graphql_relay import from_global_id
+from promise import Promise
 
-from .graphql import fields, mixins
+from .graphql import fields, loaders, mixins
 
 
 def default_resolver(attname, default_value, root, info, **args):
     """root: model instance, info:graphql.execution.base.ResolveInfo"""
-    res = resolver.default_resolver(attname, default_value, root, info, **args)
+    # forward FK/O2O are batched per request
+    res = loaders.load_related(root, attname, info)
+    if res is None:
+        res = resolver.default_resolver(attname, default_value, root, info, **args)
     if hasattr(info.parent_type.graphene_type, "patch_result"):
-        return info.parent_type.graphene_type.patch_result(res, attname, default_value, root, info, **args)
+        patch_result = info.parent_type.graphene_type.patch_result
+        if isinstance(res, Promise):
+            return res.then(lambda value: patch_result(value, attname, default_value, root, info, **args))
+        return patch_result(res, attname, default_value, root, info, **args)
     return res
 
 
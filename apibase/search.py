@@ -0,0 +1,193 @@
+"""
+search backends of `filters.WordFilter`
+
+- every row keeps a normalized (NFKC, zenkaku -> hankaku, lowercase) search document
+  of the values of the filter's `lookups`, rebuilt on save
+- search words are normalized the same way and AND-ed, like the LIKE path of WordFilter
+- `DocumentSearch`: the document in a model column, filtered with `__contains`
+  (index-backed with a PostgreSQL pg_trgm GIN index on the column)
+- `FTS5Search`: the document in a SQLite FTS5 trigram table, queried with MATCH
+
+    search = FTS5Search(lookups=["name", "owner__name"])
+    search.connect(Item)
+
+    class ItemFilter(BaseFilter):
+        keyword = WordFilter(lookups=["name", "owner__name"], backend=search)
+
+a backend returns None from `filter()` when it can not serve the queryset (other database vendor);
+WordFilter then falls back to LIKE. Adding/removing rows of a many-to-many lookup (`groups__name`) updates
+the document; other changes of related rows (renaming a group) do not: call `rebuild()`.
+"""
+
+import unicodedata
+from functools import partial
+
+import jaconv
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Manager, Q, signals
+from django.db.models.expressions import RawSQL
+
+
+def normalize(value):
+    value = unicodedata.normalize("NFKC", str(value))
+    return jaconv.zen2han(value, ascii=True, kana=True, digit=True).lower()
+
+
+def get_values(instance, path):
+    """values of `path` (`name__related__field`) from `instance`, following to-many relations"""
+    objs = [instance]
+    for name in path.split("__"):
+        values = []
+        for obj in objs:
+            try:
+                value = getattr(obj, name, None)
+            except ValueError:
+                # to-many relation of an unsaved instance
+                continue
+            if isinstance(value, Manager):
+                values.extend(value.all())
+            elif value is not None:
+                values.append(value)
+        objs = values
+    return objs
+
+
+def many_to_many_relations(model, lookups):
+    """{lookup name: field} of the many-to-many relations (either direction) `lookups` start with"""
+    res = {}
+    for name in {path.split("__")[0] for path in lookups}:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.many_to_many:
+            res[name] = field
+    return res
+
+
+class DocumentSearch:
+    """search document in `field` (TextField) of the model"""
+
+    def __init__(self, lookups, field="search_document"):
+        self.lookups = list(lookups)
+        self.field = field
+
+    def document(self, instance):
+        return "\n".join(normalize(v) for path in self.lookups for v in get_values(instance, path) if v != "")
+
+    def update_document(self, sender, instance, **kwargs):
+        setattr(instance, self.field, self.document(instance))
+
+    def save_document(self, model, instance):
+        self.update_document(model, instance)
+        model._base_manager.filter(pk=instance.pk).update(**{self.field: getattr(instance, self.field)})
+
+    def update_related(self, searched, name, sender, instance, action, pk_set=None, **kwargs):
+        """m2m_changed of the many-to-many lookup `name` of model `searched`: the documents of its changed rows"""
+        if action == "pre_clear" and not isinstance(instance, searched):
+            # the rows are not known after the clear
+            setattr(instance, f"_apibase_search_{name}", list(searched._base_manager.filter(**{name: instance})))
+            return
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+
+        if isinstance(instance, searched):
+            rows = [instance]
+        elif action == "post_clear":
+            rows = instance.__dict__.pop(f"_apibase_search_{name}", [])
+        else:
+            rows = searched._base_manager.filter(pk__in=pk_set)
+        for row in rows:
+            self.save_document(searched, row)
+
+    def connect_related(self, model):
+        for name, field in many_to_many_relations(model, self.lookups).items():
+            through = field.remote_field.through if field.concrete else field.through
+            signals.m2m_changed.connect(
+                partial(self.update_related, model, name),
+                sender=through,
+                weak=False,
+                dispatch_uid=f"apibase_search_{model._meta.label}_{name}",
+            )
+
+    def connect(self, model):
+        signals.pre_save.connect(
+            self.update_document, sender=model, weak=False, dispatch_uid=f"apibase_search_{model._meta.label}"
+        )
+        self.connect_related(model)
+
+    def rebuild(self, queryset):
+        for instance in queryset.iterator():
+            self.save_document(queryset.model, instance)
+
+    def words(self, words):
+        return [i for i in (normalize(w) for w in words) if i]
+
+    def filter(self, queryset, words):
+        return queryset.filter(*(Q(**{f"{self.field}__contains": w}) for w in self.words(words)))
+
+
+class FTS5Search(DocumentSearch):
+    """search document in SQLite FTS5 trigram table `<db_table>_search` (rowid: pk)"""
+
+    vendor = "sqlite"
+
+    def __init__(self, lookups, using="default"):
+        super().__init__(lookups, field=None)
+        self.using = using
+
+    def table(self, model):
+        return f"{model._meta.db_table}_search"
+
+    def create_table(self, model):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS "{self.table(model)}" USING fts5(document, tokenize="trigram")'
+            )
+
+    def update_document(self, sender, instance, **kwargs):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO "{self.table(sender)}" (rowid, document) VALUES (%s, %s)',
+                [instance.pk, self.document(instance)],
+            )
+
+    def save_document(self, model, instance):
+        self.update_document(model, instance)
+
+    def delete_document(self, sender, instance, **kwargs):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.table(sender)}" WHERE rowid = %s', [instance.pk])
+
+    def connect(self, model):
+        uid = f"apibase_search_{model._meta.label}"
+        signals.post_save.connect(self.update_document, sender=model, weak=False, dispatch_uid=uid)
+        signals.post_delete.connect(self.delete_document, sender=model, weak=False, dispatch_uid=uid)
+        self.connect_related(model)
+
+    def rebuild(self, queryset):
+        model = queryset.model
+        self.create_table(model)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.table(model)}"')
+        for instance in queryset.iterator():
+            self.update_document(model, instance)
+
+    def filter(self, queryset, words):
+        if queryset.db != self.using or connections[queryset.db].vendor != self.vendor:
+            return None
+        table = self.table(queryset.model)
+        for word in self.words(words):
+            if len(word) >= 3:
+                # trigram index; a quoted string is one phrase
+                sql, param = (
+                    f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s',
+                    '"{}"'.format(word.replace('"', '""')),
+                )
+            else:
+                # shorter than a trigram: scan of the documents
+                word = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                sql, param = f"SELECT rowid FROM \"{table}\" WHERE document LIKE %s ESCAPE '\\'", f"%{word}%"
+            queryset = queryset.filter(pk__in=RawSQL(sql, [param]))
+        return queryset
@@ -3,13 +3,16 @@ import re
 
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.db.models import Model
 from django.db.models.fields.reverse_related import OneToOneRel
 from django.http import QueryDict
 from django.urls import reverse
 from rest_framework import exceptions, fields, serializers
 from rest_framework.fields import empty
+from rest_framework.utils import model_meta
 
+from . import bulk
 from .urn import model_urn, rest_endpoint_from_urn
 
 
@@ -37,8 +40,8 @@ class EndpointField(fields.Field):
     def __init__(self, **kwargs):
         kwargs["source"] = "*"
         kwargs["read_only"] = True
-        self.url_name = kwargs.get("url_name", None)
-        self.attr_name = kwargs.get("attr_name", None)
+        self.url_name = kwargs.pop("url_name", None)
+        self.attr_name = kwargs.pop("attr_name", None)
         super().__init__(**kwargs)
 
     def get_url_name(self, value):
@@ -55,7 +58,7 @@ class UrnField(fields.Field):
     def __init__(self, **kwargs):
         kwargs["source"] = "*"
         kwargs["read_only"] = True
-        self.attr_name = kwargs.get("attr_name", None)
+        self.attr_name = kwargs.pop("attr_name", None)
         super().__init__(**kwargs)
 
     def to_representation(self, value):
@@ -67,7 +70,7 @@ class DisplayField(fields.Field):
     def __init__(self, **kwargs):
         kwargs["source"] = "*"
         kwargs["read_only"] = True
-        self.attr_name = kwargs.get("attr_name", None)
+        self.attr_name = kwargs.pop("attr_name", None)
         super().__init__(**kwargs)
 
     def to_representation(self, value):
@@ -83,6 +86,9 @@ class BaseModelSerializer(serializers.ModelSerializer):
 
     nested_fields = []
     nested_fields_updateds_signal = None
+    # synchronise children with one load and bulk writes instead of `update_or_create` per child
+    nested_bulk_sync = False
+    nested_delete_orphans = False
 
     action_handlers = {}
 
@@ -164,42 +170,167 @@ class BaseModelSerializer(serializers.ModelSerializer):
     def patch_children(self, instance, field_name, data):
         return data
 
-    def update_nested(self, instance, validated_data, field_name, children):
-        if not children or not instance:
-            return []
-
+    def get_nested_relation(self, field_name):
         name = re.sub(r"(.+)(_set)$", r"\g<1>", field_name)
         related_field = self.Meta.model._meta.get_field(name)
-        remote_field_name = related_field.remote_field.name
 
         if isinstance(related_field, OneToOneRel):
-            children = [children]
             ser = self.fields[field_name]
         else:
             ser = self.fields[field_name].child
+        return related_field, ser
 
+    def get_nested_defaults(self, instance, related_field):
         if isinstance(related_field, GenericRelation):
-            defaults = {
+            return {
                 related_field.object_id_field_name: instance.id,
                 related_field.content_type_field_name: ContentType.objects.get_for_model(instance),
             }
-        else:
-            defaults = {remote_field_name: instance.id}
+        return {related_field.remote_field.name: instance.id}
+
+    def get_nested_attnames(self, instance, related_field):
+        """parent keys of a child row, assigned directly instead of validated per child"""
+        if isinstance(related_field, GenericRelation):
+            content_type_field = related_field.related_model._meta.get_field(related_field.content_type_field_name)
+            return {
+                related_field.object_id_field_name: instance.id,
+                content_type_field.attname: ContentType.objects.get_for_model(instance).id,
+            }
+        return {related_field.field.attname: instance.id}
+
+    def prepare_nested_item(self, instance, field_name, item, defaults):
+        item.update(defaults)
+        for key in item:
+            if isinstance(item[key], Model):
+                # prevent serilizer.is_valid() -> False
+                item[key] = item[key].id
+
+        return self.patch_children(instance, field_name, item)
+
+    def update_nested(self, instance, validated_data, field_name, children):
+        if not children or not instance:
+            return []
+
+        if self.nested_bulk_sync and self.can_bulk_nested(field_name):
+            return self.sync_nested(instance, field_name, children)
+
+        related_field, ser = self.get_nested_relation(field_name)
+        if isinstance(related_field, OneToOneRel):
+            children = [children]
+
+        defaults = self.get_nested_defaults(instance, related_field)
 
         items = []
         for item in children:
             if isinstance(item, str):
                 pass
-            item.update(defaults)
-            for key in item:
-                if isinstance(item[key], Model):
-                    # prevent serilizer.is_valid() -> False
-                    item[key] = item[key].id
-
-            data = self.patch_children(instance, field_name, item)
+            data = self.prepare_nested_item(instance, field_name, item, defaults)
             items.append(ser.update_or_create(partial=self.partial, context=self.context, **data))
         return items
 
+    def build_nested_child(self, instance, field_name, related_field, ser, item, child=None):
+        """validate a child without its parent keys and return an unsaved (or updated) model instance"""
+        attnames = self.get_nested_attnames(instance, related_field)
+        defaults = self.get_nested_defaults(instance, related_field)
+        data = self.prepare_nested_item(instance, field_name, item, defaults)
+
+        serializer = ser.__class__(instance=child, data=data, partial=self.partial, context=self.context)
+        for name in defaults:
+            serializer.fields.pop(name, None)
+        serializer.is_valid(raise_exception=True)
+
+        validated_data = dict(serializer.validated_data)
+        validated_data.pop("id", None)
+        child = child or related_field.related_model(**attnames)
+        for attr, value in validated_data.items():
+            setattr(child, attr, value)
+        for attr, value in attnames.items():
+            setattr(child, attr, value)
+        return child
+
+    def can_bulk_nested(self, field_name):
+        related_field, ser = self.get_nested_relation(field_name)
+        model = related_field.related_model
+        relations = model_meta.get_field_info(model).relations
+        to_many = any(f.source in relations and relations[f.source].to_many for f in ser._writable_fields)
+        return not (to_many or getattr(ser, "nested_fields", None)) and bulk.can_bulk_create(model)
+
+    def get_nested_queryset(self, instance, related_field):
+        manager = related_field.related_model._default_manager
+        if isinstance(related_field, GenericRelation):
+            return manager.filter(
+                **{
+                    related_field.object_id_field_name: instance.id,
+                    related_field.content_type_field_name: ContentType.objects.get_for_model(instance),
+                }
+            )
+        return manager.filter(**{related_field.field.name: instance})
+
+    def sync_nested(self, instance, field_name, children):
+        """load the relation once, diff it with `children` and write with bulk create/update (and delete)"""
+        related_field, ser = self.get_nested_relation(field_name)
+        model = related_field.related_model
+        one_to_one = isinstance(related_field, OneToOneRel)
+        children = [children] if one_to_one else children
+
+        # children of `instance` and rows moved here by id, in one query
+        ids = {model._meta.pk.to_python(item["id"]) for item in children if item.get("id")}
+        queryset = self.get_nested_queryset(instance, related_field) | model._default_manager.filter(pk__in=ids)
+        existing = {obj.pk: obj for obj in queryset}
+        attnames = self.get_nested_attnames(instance, related_field)
+        current = [
+            pk
+            for pk, obj in existing.items()
+            if all(str(getattr(obj, attr)) == str(value) for attr, value in attnames.items())
+        ]
+
+        creating, updating = [], []
+        for item in children:
+            pk = item.get("id") and model._meta.pk.to_python(item["id"])
+            child = existing.get(pk)
+            if one_to_one and not pk and current:
+                child = existing.get(current[0])
+            obj = self.build_nested_child(instance, field_name, related_field, ser, item, child=child)
+            (updating if child else creating).append(obj)
+
+        concrete = {f.name: f for f in model._meta.concrete_fields if not f.primary_key}
+        update_fields = {f.source for f in ser._writable_fields if f.source in concrete}
+        update_fields.update(attnames)
+        for field in concrete.values():
+            if getattr(field, "auto_now", False):
+                update_fields.add(field.name)
+                for obj in updating:
+                    field.pre_save(obj, False)
+
+        with transaction.atomic():
+            orphans = set(current) - {obj.pk for obj in updating}
+            if self.nested_delete_orphans and orphans:
+                model._default_manager.filter(pk__in=orphans).delete()
+            if updating and update_fields:
+                model._default_manager.bulk_update(updating, sorted(update_fields))
+            if creating:
+                model._default_manager.bulk_create(creating)
+
+        return updating + creating
+
+    def bulk_create_nested(self, field_name, pairs, batch_size=None):
+        """pairs: [(instance, children)] of newly created parents; one `bulk_create` per relation"""
+        if not self.can_bulk_nested(field_name):
+            return [self.update_nested(instance, {}, field_name, children) for instance, children in pairs]
+
+        related_field, ser = self.get_nested_relation(field_name)
+        objects = []
+        for instance, children in pairs:
+            if not children:
+                continue
+            if isinstance(related_field, OneToOneRel):
+                children = [children]
+            objects.extend(
+                self.build_nested_child(instance, field_name, related_field, ser, item) for item in children
+            )
+
+        return related_field.related_model._default_manager.bulk_create(objects, batch_size=batch_size)
+
     def update_nested_field(self, field_name, instance, validated_data, children):
         results = self.update_nested(instance, validated_data, field_name, children)
         return results
@@ -262,12 +393,99 @@ class BatchSerializerMixin:
 
             ret[id_attr] = id_value
 
+        if isinstance(self.root, BatchListSerializer):
+            # keep nested children per item: `_children_set` only holds the last item's
+            ret.update(getattr(self, "children_set", {}))
+
         return ret
 
 
 class BatchListSerializer(serializers.ListSerializer):
     update_lookup_field = "id"
 
+    # Meta.bulk_update / Meta.bulk_create / Meta.bulk_batch_size of the child serializer take precedence
+    bulk_update = False
+    bulk_create = False
+    bulk_batch_size = 500
+
+    def get_bulk_option(self, name):
+        return getattr(self.child.Meta, name, getattr(self, name))
+
+    def pop_children_set(self, validated_data):
+        nested_fields = getattr(self.child, "nested_fields", None) or []
+        return {i: validated_data.pop(i) for i in nested_fields if i in validated_data}
+
+    def dispatch_action(self, instance):
+        action = hasattr(self.child, "_get_action") and self.child._get_action(self.child.view_action)
+        if action:
+            self.child.instance = instance
+            action.dispatch()
+
+    def update_objects(self, objects, updating, id_attr):
+        updated_objects = []
+
+        for instance in objects:
+            obj_id = getattr(instance, id_attr)
+            obj_validated_data = updating.get(obj_id)
+
+            children_set = self.pop_children_set(obj_validated_data)
+            if children_set:
+                self.child._children_set = children_set
+            instance = self.child.update(instance, obj_validated_data)
+            self.dispatch_action(instance)
+            updated_objects.append(instance)
+
+        return updated_objects
+
+    def bulk_update_objects(self, objects, updating, id_attr):
+        """
+        set changed attributes on every object and write them with chunked `bulk_update`
+
+        - `save()` is not called and `pre_save`/`post_save` are not sent: falls back to per-row `update`
+          for models overriding `save()` or with receivers of those signals
+        """
+        model = self.child.Meta.model
+        if not bulk.can_bulk_update(model):
+            return self.update_objects(objects, updating, id_attr)
+        info = model_meta.get_field_info(model)
+        concrete = {f.name: f for f in model._meta.concrete_fields if not f.primary_key}
+        auto_now = [f for f in concrete.values() if getattr(f, "auto_now", False)]
+
+        update_fields, many_to_many, nested = set(), [], []
+        for instance in objects:
+            validated_data = updating.get(getattr(instance, id_attr))
+            children_set = self.pop_children_set(validated_data)
+
+            for attr, value in validated_data.items():
+                if attr in info.relations and info.relations[attr].to_many:
+                    many_to_many.append((instance, attr, value))
+                    continue
+                setattr(instance, attr, value)
+                if attr in concrete:
+                    update_fields.add(attr)
+
+            for field in auto_now:
+                field.pre_save(instance, False)
+                update_fields.add(field.name)
+
+            nested.append((instance, validated_data, children_set))
+
+        with transaction.atomic():
+            if update_fields:
+                model._default_manager.bulk_update(
+                    objects, sorted(update_fields), batch_size=self.get_bulk_option("bulk_batch_size")
+                )
+
+            for instance, attr, value in many_to_many:
+                getattr(instance, attr).set(value)
+
+            for instance, validated_data, children_set in nested:
+                if hasattr(self.child, "update_nested_fields"):
+                    self.child.update_nested_fields(instance, validated_data, children_set)
+                self.dispatch_action(instance)
+
+        return objects
+
     def update(self, queryset, all_validated_data):
         id_attr = getattr(self.child.Meta, "update_lookup_field", "id")
 
@@ -276,21 +494,83 @@ class BatchListSerializer(serializers.ListSerializer):
         if not all(bool(i) and not inspect.isclass(i) for i in updating.keys()):
             raise exceptions.ValidationError("")
 
-        objects_to_update = queryset.filter(
-            **{
-                f"{id_attr}__in": updating.keys(),
-            }
+        objects_to_update = list(
+            queryset.filter(
+                **{
+                    f"{id_attr}__in": updating.keys(),
+                }
+            )
         )
 
-        if len(updating) != objects_to_update.count():
+        if len(updating) != len(objects_to_update):
             raise exceptions.ValidationError("Could not find all objects to update.")
 
-        updated_objects = []
+        if self.get_bulk_option("bulk_update"):
+            return self.bulk_update_objects(objects_to_update, updating, id_attr)
+
+        return self.update_objects(objects_to_update, updating, id_attr)
+
+    def create_objects(self, all_validated_data):
+        created_objects = []
+        for attrs in all_validated_data:
+            children_set = self.pop_children_set(attrs)
+            if children_set:
+                self.child._children_set = children_set
+            instance = self.child.create(attrs)
+            self.dispatch_action(instance)
+            created_objects.append(instance)
+        return created_objects
+
+    def bulk_create_objects(self, all_validated_data):
+        """
+        insert parents with chunked `bulk_create`, then many-to-many values and nested children per relation
+
+        - `save()` is not called and `pre_save`/`post_save` are not sent: falls back to per-row `create`
+          for models overriding `save()` or with receivers of those signals, for multi-table inheritance
+          and on backends that can not return PKs from a bulk insert (the response renders them)
+        """
+        model = self.child.Meta.model
+        info = model_meta.get_field_info(model)
+        batch_size = self.get_bulk_option("bulk_batch_size")
+
+        nested_fields = getattr(self.child, "nested_fields", None) or []
+        to_many = [name for name, relation in info.relations.items() if relation.to_many]
+        if not bulk.can_bulk_create(model, needs_pk=True):
+            return self.create_objects(all_validated_data)
+
+        rows = []
+        for validated_data in all_validated_data:
+            children_set = self.pop_children_set(validated_data)
+            many_to_many = {name: validated_data.pop(name) for name in to_many if name in validated_data}
+            rows.append((validated_data, many_to_many, children_set))
+
+        with transaction.atomic():
+            objects = model._default_manager.bulk_create(
+                [model(**validated_data) for validated_data, _, _ in rows], batch_size=batch_size
+            )
 
-        for instance in objects_to_update:
-            obj_id = getattr(instance, id_attr)
-            obj_validated_data = updating.get(obj_id)
+            for name in {name for _, many_to_many, _ in rows for name in many_to_many}:
+                pairs = [(obj, row[1][name]) for obj, row in zip(objects, rows) if name in row[1]]
+                if name in info.forward_relations:
+                    bulk.bulk_set_many_to_many(model, name, pairs, batch_size=batch_size)
+                else:
+                    for obj, values in pairs:
+                        getattr(obj, name).set(values)
 
-            updated_objects.append(self.child.update(instance, obj_validated_data))
+            for field_name in nested_fields:
+                pairs = [(obj, row[2].get(field_name)) for obj, row in zip(objects, rows)]
+                if any(children for _, children in pairs):
+                    self.child.bulk_create_nested(field_name, pairs, batch_size=batch_size)
 
-        return updated_objects
+            for obj in objects:
+                if getattr(self.child, "nested_fields_updateds_signal", None):
+                    self.child.nested_fields_updateds_signal.send(sender=model, instance=obj)
+                self.dispatch_action(obj)
+
+        return objects
+
+    def create(self, validated_data):
+        """(override)"""
+        if self.get_bulk_option("bulk_create"):
+            return self.bulk_create_objects(validated_data)
+        return self.create_objects(validated_data)
@@ -9,5 +9,36 @@ apibase_settings = Settings.create(
         ("DOMAIN", (False, None)),
         ("SCHEME", (False, "https")),
         ("STORAGE_PREFIX", (False, "storage")),
+        # response header showing the select_related/prefetch_related plan of BaseModelViewSet (debug)
+        ("QUERYSET_PLAN_HEADER", (False, None)),
+        # default count strategy of paginations.Pagination: "exact", "cached" or "estimated"
+        ("PAGINATION_COUNT_STRATEGY", (False, "exact")),
+        # models ("app_label.Model") whose counts the "cached" strategy may cache:
+        # their changes expire the entries, queries of other tables are counted exactly
+        ("COUNT_CACHE_MODELS", (False, [])),
+        # parsed and validated documents kept for utils.gql_query (0: no cache)
+        ("GQL_DOCUMENT_CACHE_SIZE", (False, 256)),
+        # persisted queries of DRFAuthenticatedGraphQLView:
+        # JSON {sha256: query} written by `manage.py graphql_persisted_queries`
+        ("PERSISTED_QUERY_MANIFEST", (False, None)),
+        # accept only queries of the manifest
+        ("PERSISTED_QUERY_ALLOWLIST", (False, False)),
+        # cache alias and timeout for first-seen queries
+        ("PERSISTED_QUERY_CACHE", (False, "default")),
+        ("PERSISTED_QUERY_TIMEOUT", (False, 60 * 60 * 24)),
+        # static query cost limits of DRFAuthenticatedGraphQLView (None: unlimited), see graphql.cost
+        ("GQL_MAX_COST", (False, None)),
+        ("GQL_MAX_DEPTH", (False, None)),
+        # report {"cost", "depth"} in the response `extensions`
+        ("GQL_COST_EXTENSIONS", (False, True)),
+        # serve views.sdl/views.introspection gzip-compressed to clients accepting it
+        ("SCHEMA_GZIP", (False, True)),
+        # seconds filters.AllValuesMultipleFilter keeps its choices in the cache
+        ("FILTER_CHOICES_TIMEOUT", (False, 300)),
+        # models ("app_label.Model") whose AllValuesMultipleFilter choices are cached:
+        # their changes expire the entries, choices of other models are queried every time
+        ("FILTER_CHOICES_MODELS", (False, [])),
+        # seconds permission sets are shared across requests (None: per request only)
+        ("PERMISSION_CACHE_TIMEOUT", (False, None)),
     ),
 )
@@ -6,16 +6,29 @@ import six
 from django_filters.fields import MultipleChoiceField
 from django_filters.filters import RangeFilter
 from django_filters.utils import get_model_field
-from gql import Client, gql
 from graphene_django.forms.converter import convert_form_field
 from graphene_django.settings import graphene_settings
 from graphql_relay import to_global_id
 from graphql_relay.connection.arrayconnection import get_offset_with_default
 
 from .fields import ListCharField, ListIntegerField, MonthRangeField
+from .graphql import documents
+
+_filtering_args = {}
 
 
 def get_filtering_args_from_filterset(filterset_class, type, obvious_filters=None):
+    """
+    Arguments of `filterset_class` computed once per (filterset_class, obvious_filters)
+    and shared by every NodeSet using them (a copy of the map is returned).
+    """
+    key = (filterset_class, tuple(obvious_filters or ()))
+    if key not in _filtering_args:
+        _filtering_args[key] = build_filtering_args(filterset_class, obvious_filters=obvious_filters)
+    return dict(_filtering_args[key])
+
+
+def build_filtering_args(filterset_class, obvious_filters=None):
     """
     Original:
         - https://github.com/graphql-python/graphene-django/blob/master/graphene_django/filter/utils.py#L7
@@ -67,9 +80,13 @@ def resolve_start_offset(slice_start, after):
 
 
 def gql_query(schema, query_str, **params):
-    client = Client(schema=schema)
-    query = gql(query_str)
-    return client.execute(query, variable_values=params)
+    # parsed and validated once per (schema, query_str)
+    client = documents.get_client(schema)
+    query = documents.document_cache.get(client.schema, query_str)
+    result = client.transport.execute(query, variable_values=params)
+    if result.errors:
+        raise Exception(str(result.errors[0]))
+    return result.data
 
 
 def to_gql_relay_id(schema_name, id):
@@ -1,11 +1,22 @@
+import gzip
+import hashlib
+import json
+from functools import cache
+
 import rest_framework
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotModified
+from django.utils.http import parse_etags
 from graphene_django import settings, views
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult
 from graphql.utils import schema_printer
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.settings import api_settings
 
+from .graphql import cost, documents, persisted
+from .settings import apibase_settings
+
 
 def _decorate(view):
     view = permission_classes((IsAuthenticated,))(view)
@@ -14,6 +25,61 @@ def _decorate(view):
 
 
 class DRFAuthenticatedGraphQLView(views.GraphQLView):
+    def __init__(self, *args, backend=None, **kwargs):
+        # documents are parsed and validated once
+        super().__init__(*args, backend=backend or documents.cached_backend, **kwargs)
+
+    def get_graphql_params(self, request, data):
+        """(override) query of persisted query hash"""
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError as err:
+                raise views.HttpError(HttpResponseBadRequest("Extensions are invalid JSON.")) from err
+
+        self.persisted_query_error = None
+        self.query_cost = None
+        try:
+            query = persisted.resolve(query, extensions)
+        except persisted.PersistedQueryError as err:
+            self.persisted_query_error = err
+        return query, variables, operation_name, id
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        error = getattr(self, "persisted_query_error", None)
+        if error:
+            return ExecutionResult(errors=[error], invalid=error.invalid)
+
+        errors = self.check_query_cost(request, query, variables, operation_name)
+        if errors:
+            return ExecutionResult(
+                errors=[GraphQLError(i, extensions={"code": "QUERY_TOO_COMPLEX"}) for i in errors], invalid=True
+            )
+        return super().execute_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+
+    def check_query_cost(self, request, query, variables, operation_name):
+        """static cost analysis before execution, returns the messages of the exceeded limits"""
+        if not query:
+            return []
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+        except Exception:
+            # reported by execute_graphql_request
+            return []
+        self.query_cost, errors = cost.check(
+            self.schema, document.document_ast, operation_name=operation_name, variables=variables
+        )
+        return errors
+
+    def json_encode(self, request, d, pretty=False):
+        """(override) query cost in `extensions`"""
+        query_cost = getattr(self, "query_cost", None)
+        if query_cost and apibase_settings.GQL_COST_EXTENSIONS and isinstance(d, dict):
+            d = {**d, "extensions": {**d.get("extensions", {}), "cost": query_cost.as_dict()}}
+        return super().json_encode(request, d, pretty=pretty)
+
     def parse_body(self, request):
         if isinstance(request, rest_framework.request.Request):
             return request.data
@@ -24,8 +90,68 @@ class DRFAuthenticatedGraphQLView(views.GraphQLView):
         return _decorate(super().as_view(*args, **kwargs))
 
 
+def etag_matches(header, etag):
+    """If-None-Match `header` matches `etag` by weak comparison (RFC 9110 13.1.2)"""
+    etags = parse_etags(header)
+    return "*" in etags or any(i.removeprefix("W/") == etag for i in etags)
+
+
+def accepts_gzip(header):
+    """Accept-Encoding `header` accepts gzip with a non-zero quality value"""
+    qualities = {}
+    for item in header.split(","):
+        coding, *params = [i.strip() for i in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    quality = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return quality > 0
+
+
+class SchemaDocument:
+    """printed schema computed once per process, with a strong ETag and a gzip body"""
+
+    def __init__(self, content, content_type):
+        self.content = content.encode()
+        self.content_type = content_type
+        self.etag = f'"{hashlib.sha256(self.content).hexdigest()}"'
+        self.gzipped = gzip.compress(self.content, mtime=0)
+
+    def response(self, request):
+        headers = {"ETag": self.etag, "Vary": "Accept-Encoding"}
+        if etag_matches(request.META.get("HTTP_IF_NONE_MATCH", ""), self.etag):
+            response = HttpResponseNotModified()
+        elif apibase_settings.SCHEMA_GZIP and accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            response = HttpResponse(self.gzipped, content_type=self.content_type)
+            headers["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(self.content, content_type=self.content_type)
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+
+@cache
+def get_schema_document(schema, kind):
+    if kind == "introspection":
+        content = json.dumps({"data": schema.introspect()}, sort_keys=True)
+        return SchemaDocument(content, "application/json")
+    return SchemaDocument(schema_printer.print_schema(schema), "text/plain")
+
+
 @_decorate
 def sdl(request):
     """GraphQL Schema Definition Language (SDL)."""
-    schema_str = schema_printer.print_schema(settings.graphene_settings.SCHEMA)
-    return HttpResponse(schema_str, content_type="text/plain")
+    return get_schema_document(settings.graphene_settings.SCHEMA, "sdl").response(request)
+
+
+@_decorate
+def introspection(request):
+    """GraphQL introspection query result (JSON)."""
+    return get_schema_document(settings.graphene_settings.SCHEMA, "introspection").response(request)
@@ -1,29 +1,30 @@
+from itertools import islice
 from logging import getLogger
 from pathlib import Path
 
-from django.contrib.auth.models import Permission
-from django.http import Http404
+from django.db.models import prefetch_related_objects
+from django.http import Http404, StreamingHttpResponse
 from django.utils.functional import cached_property
 from django.views import static
 from rest_framework import decorators, serializers, status, viewsets
 from rest_framework.response import Response
 
-from . import paginations, permissions, storages, utils
+from . import fieldsets, paginations, permissions, planners, renderers, storages, utils
 from .settings import apibase_settings
 
 logger = getLogger()
 
 
 class ViewSetMixin:
+    @classmethod
+    def perm_codes(cls):
+        return [p.PERM_CODE for p in cls.permission_classes if issubclass(p, permissions.Permission) and p.PERM_CODE]
+
     @classmethod
     def permissions(cls):
-        return [
-            Permission.objects.filter(
-                **dict(zip(("content_type__app_label", "codename"), p.PERM_CODE.split(".")))
-            ).first()
-            for p in cls.permission_classes
-            if issubclass(p, permissions.Permission) and p.PERM_CODE
-        ]
+        codes = cls.perm_codes()
+        objects = permissions.get_permission_objects(codes)
+        return [objects[code] for code in codes]
 
     @property
     def is_safe_method(self):
@@ -81,7 +82,15 @@ class DownloadMixin:
 
 class BaseModelViewSet(viewsets.ModelViewSet, ViewSetMixin, DownloadMixin):
     pagination_class = paginations.Pagination
+    # query parameter names for sparse fieldsets: ?fields=a,b,c.d / ?exclude=...
     fields_query = None
+    exclude_query = None
+    # select_related/prefetch_related planned from the serializer for safe methods
+    queryset_planning = True
+    queryset_plan = None
+    # stream CSV/TSV lists from `QuerySet.iterator()` instead of rendering them in memory
+    stream_export = False
+    stream_chunk_size = 2000
 
     @decorators.action(methods=["post"], detail=False)
     def batch_create(self, request, *args, **kwargs):
@@ -95,6 +104,39 @@ class BaseModelViewSet(viewsets.ModelViewSet, ViewSetMixin, DownloadMixin):
             return self.list(request)
         return self.update(request, pk=None, many=True, partial=True)
 
+    def list(self, request, *args, **kwargs):
+        """(override)"""
+        renderer = getattr(request, "accepted_renderer", None)
+        if self.stream_export and getattr(renderer, "format", None) in ("csv", "tsv"):
+            return self.stream_list(request, renderer)
+        return super().list(request, *args, **kwargs)
+
+    def iter_serialized_chunks(self, queryset):
+        lookups = queryset._prefetch_related_lookups
+        rows = queryset.prefetch_related(None).iterator(chunk_size=self.stream_chunk_size)
+        while True:
+            chunk = list(islice(rows, self.stream_chunk_size))
+            if not chunk:
+                return
+            prefetch_related_objects(chunk, *lookups)
+            yield self.get_serializer(chunk, many=True).data
+
+    def stream_list(self, request, renderer):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # fields (and labels) for the renderer context
+        self.get_serializer()
+        context = self.get_renderer_context()
+
+        content = renderers.stream_table(
+            self.iter_serialized_chunks(queryset),
+            header=context.get("header"),
+            labels=context.get("labels"),
+            encoding=context.get("encoding") or renderer.charset or "utf-8",
+            writer_opts={"delimiter": "\t"} if renderer.format == "tsv" else None,
+        )
+        return StreamingHttpResponse(content, content_type=f"{renderer.media_type}; charset=utf-8")
+
     def update(self, request, *args, **kwargs):
         """(override)"""
         many = kwargs.pop("many", False)
@@ -128,6 +170,47 @@ class BaseModelViewSet(viewsets.ModelViewSet, ViewSetMixin, DownloadMixin):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    def get_fieldset(self):
+        """
+        (fields, exclude) paths requested for a safe method, reduced to the serializer's field names
+        (fields: None when not requested)
+        """
+        if not self.is_safe_method:
+            return None, ()
+        params = self.request.query_params
+        fields = fieldsets.parse(self.fields_query and params.get(self.fields_query))
+        exclude = fieldsets.parse(self.exclude_query and params.get(self.exclude_query))
+        if not (fields or exclude):
+            return None, ()
+        tree = fieldsets.get_field_tree(self)
+        return (
+            fieldsets.known_paths(tree, fields) if fields else None,
+            fieldsets.known_paths(tree, exclude, exclude=True),
+        )
+
+    def get_queryset_plan(self):
+        fieldset = self.get_fieldset()
+        if fieldset == (None, ()):
+            return planners.plan_view(self)
+        return planners.plan_view(self, fieldset, build=fieldsets.plan_fieldset)
+
+    def get_queryset(self):
+        """(override)"""
+        queryset = super().get_queryset()
+        if not (self.queryset_planning and self.is_safe_method):
+            return queryset
+
+        self.queryset_plan = self.get_queryset_plan()
+        return self.queryset_plan.apply(queryset)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """(override)"""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        header = apibase_settings.QUERYSET_PLAN_HEADER
+        if header and self.queryset_plan is not None:
+            response[header] = str(self.queryset_plan)
+        return response
+
     def paginate_queryset(self, queryset):
         """(override)"""
         # dirty coding for CSV rendering
@@ -139,6 +222,14 @@ class BaseModelViewSet(viewsets.ModelViewSet, ViewSetMixin, DownloadMixin):
         """(override)"""
         ser = super().get_serializer(*args, **kwargs)
 
+        fields, exclude = self.get_fieldset()
+        if fields is not None or exclude:
+            fieldsets.prune(
+                ser,
+                include=None if fields is None else fieldsets.to_tree(fields),
+                exclude=fieldsets.to_tree(exclude),
+            )
+
         if isinstance(ser, serializers.ListSerializer):
             self._fields = ser.child.fields
         else: